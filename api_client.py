@@ -0,0 +1,147 @@
+import asyncio
+import os
+from collections import OrderedDict
+
+import httpx
+
+
+class APIClient:
+    """Async client for the StockX API sharing one keep-alive connection pool.
+
+    Every bot handler goes through a single instance so that concurrent
+    conversations reuse the same connections instead of blocking the event loop
+    on synchronous round trips.
+
+    GET responses carrying an ETag or Last-Modified header are remembered (up
+    to `max_cached_responses` URLs) and revalidated with If-None-Match /
+    If-Modified-Since; a 304 is answered from the stored body, so callers always
+    see a regular 200 response.
+    """
+
+    def __init__(self, base_url, timeout=10.0, connect_timeout=5.0, max_connections=20,
+                 max_keepalive_connections=10, max_concurrency=20, max_cached_responses=256):
+        self.base_url = base_url or ''
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.max_concurrency = max_concurrency
+        self._client = None
+        self._semaphore = None
+        self.max_cached_responses = max_cached_responses
+        # URL -> (validator headers, status-200 response), least recently used first
+        self._validated = OrderedDict()
+
+    @classmethod
+    def from_env(cls):
+        """Build a client from the API_* environment variables."""
+        return cls(
+            os.getenv('API_ENDPOINT'),
+            timeout=float(os.getenv('API_TIMEOUT', 10)),
+            connect_timeout=float(os.getenv('API_CONNECT_TIMEOUT', 5)),
+            max_connections=int(os.getenv('API_MAX_CONNECTIONS', 20)),
+            max_keepalive_connections=int(os.getenv('API_MAX_KEEPALIVE_CONNECTIONS', 10)),
+            max_concurrency=int(os.getenv('API_MAX_CONCURRENCY', 20)),
+            max_cached_responses=int(os.getenv('API_MAX_CACHED_RESPONSES', 256)),
+        )
+
+    @property
+    def client(self):
+        # Created lazily so the pool is bound to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def request(self, method, path, **kwargs):
+        """Send a request to `path` (relative to the API endpoint) and return the response."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await self.client.request(method, path, **kwargs)
+
+    async def get(self, path, **kwargs):
+        """GET `path`, revalidating a previously seen response instead of downloading it again."""
+        if self.max_cached_responses <= 0 or 'json' in kwargs or 'content' in kwargs:
+            return await self.request('GET', path, **kwargs)
+
+        # Some endpoints read the Telegram user from the body, so it is part of the key
+        key = (str(self.client.build_request('GET', path, params=kwargs.get('params')).url), repr(kwargs.get('data')))
+        cached = self._validated.get(key)
+        if cached is not None:
+            validators, _ = cached
+            kwargs['headers'] = {**validators, **(kwargs.get('headers') or {})}
+
+        response = await self.request('GET', path, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            self._validated.move_to_end(key)
+            _, stored = cached
+            # The stored content is already decoded, so drop the transfer headers describing the raw body
+            headers = [(name, value) for name, value in stored.headers.items() if name not in ('content-encoding', 'content-length', 'transfer-encoding')]
+            return httpx.Response(200, headers=headers, content=stored.content, request=response.request)
+
+        validators = {}
+        if response.headers.get('etag'):
+            validators['If-None-Match'] = response.headers['etag']
+        if response.headers.get('last-modified'):
+            validators['If-Modified-Since'] = response.headers['last-modified']
+        if response.status_code == 200 and validators:
+            self._validated[key] = (validators, response)
+            self._validated.move_to_end(key)
+            while len(self._validated) > self.max_cached_responses:
+                self._validated.popitem(last=False)
+        else:
+            self._validated.pop(key, None)
+        return response
+
+    async def get_all(self, path, params=None, **kwargs):
+        """GET a cursor-paginated list endpoint and return the rows of every page."""
+        results = []
+        url = path
+        while url:
+            response = await self.get(url, params=params, **kwargs)
+            response.raise_for_status()
+            page = response.json()
+            results.extend(page['results'])
+            # The next link already carries the query string, cursor included
+            url, params = page['next'], None
+        return results
+
+    async def get_all_normalized(self, path, params=None, **kwargs):
+        """
+        Like get_all for a list endpoint supporting ?format=normalized: each
+        product travels once per page instead of once per row, and every row's
+        `product` id is swapped back for the (shared) product dict, with its
+        category, brand and colors, so rows look like the full format's.
+        """
+        params = {**(params or {}), 'format': 'normalized'}
+        results = []
+        included = {}
+        url = path
+        while url:
+            response = await self.get(url, params=params, **kwargs)
+            response.raise_for_status()
+            page = response.json()
+            results.extend(page['results'])
+            for name, objects in page['included'].items():
+                included.setdefault(name, {}).update(objects)
+            url, params = page['next'], None
+
+        products = included.get('products', {})
+        for product in products.values():
+            if isinstance(product.get('category'), int):
+                product['category'] = included['categories'].get(str(product['category']))
+                product['brand'] = included['brands'].get(str(product['brand']))
+                product['colors'] = [included['colors'].get(str(color)) for color in product['colors']]
+        for row in results:
+            row['product'] = products.get(str(row['product']))
+        return results
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    async def put(self, path, **kwargs):
+        return await self.request('PUT', path, **kwargs)
+
+    async def close(self):
+        """Close the underlying connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -1,8 +1,8 @@
-from collections import defaultdict
+import asyncio
 import os
 import logging
-import requests
 import json
+import httpx
 from PIL import Image
 from typing import List
 from tabulate import tabulate
@@ -22,6 +22,12 @@ from telegram.ext import (
 )
 from telegram.constants import ParseMode
 
+from api_client import APIClient
+from reference_cache import ReferenceCache
+from replica import CatalogReplica
+from rendering import ChartRenderer, RenderQueueFull
+from charts import generate_bar_chart, generate_top_ten_products_bar_chart, generate_stock_bar_charts, generate_sales_time_series_chart
+
 # Load environment variables
 load_dotenv()
 
@@ -33,7 +39,24 @@ logger = logging.getLogger(__name__)
 
 # Define your bot token
 BOT_TOKEN = os.getenv('BOT_TOKEN')
-API_ENDPOINT = os.getenv('API_ENDPOINT')
+
+# Shared async client (one connection pool) used by every handler to talk to the API
+api = APIClient.from_env()
+
+# Categories, brands, size ranges and colors, cached in-process and refreshed in the background
+reference_data = ReferenceCache(api, ttl=int(os.getenv('REFERENCE_CACHE_TTL', 300)))
+
+# Local copies of the stock and product lists, kept current with ?since= delta syncs. The
+# slider shows whole products; the sale, stock update and report flows only need these fields
+stock_replica = CatalogReplica(api, "/stocks/")
+stock_summary_replica = CatalogReplica(api, "/stocks/", fields="id,stock_on_hand,product.id,product.name,product.code,product.category.id")
+product_replica = CatalogReplica(api, "/products/", fields="id,name,code")
+
+# Process pool rendering the report charts off the event loop
+renderer = ChartRenderer.from_env()
+# Best sellers drawn individually and values labelled on the sales over time chart
+SALES_CHART_MAX_SERIES = int(os.getenv('SALES_CHART_MAX_SERIES', 10))
+SALES_CHART_MAX_ANNOTATIONS = int(os.getenv('SALES_CHART_MAX_ANNOTATIONS', 50))
 
 # Define states for conversation handler
 ADD_PRODUCT, ADD_PRODUCT_NAME, ADD_PRODUCT_CODE, ADD_PRODUCT_DESCRIPTION, ADD_PRODUCT_PRICE_1, ADD_PRODUCT_PRICE_2, ADD_PRODUCT_QUANTITY, ADD_PRODUCT_IMAGE, ADD_PRODUCT_CATEGORY, ADD_PRODUCT_BRAND, ADD_PRODUCT_SIZE, ADD_PRODUCT_COLOR = range(12)
@@ -51,7 +74,7 @@ async def start(update: Update, context: CallbackContext) -> None:
     last_name = update.effective_user.last_name if update.effective_user.last_name else "N/A"
     username = update.effective_user.username if update.effective_user.username else "N/A"
     
-    user_store = requests.get(f"{API_ENDPOINT}/stores/")
+    user_store = await api.get("/stores/")
     # Store the user's details in the context and database
     user = {
         "tg_id": user_id,
@@ -100,7 +123,7 @@ async def start(update: Update, context: CallbackContext):
         return CHOOSE_ACTION
     else:
         # create stockx user
-        response = requests.post(f"{API_ENDPOINT}/stockxuser/create/", json={"tg_id": tg_id, "first_name": first_name, "last_name": last_name, "username": username})
+        response = await api.post("/stockxuser/create/", json={"tg_id": tg_id, "first_name": first_name, "last_name": last_name, "username": username})
     
         # User is new, prompt to choose between creating or joining a store
         await update.message.reply_text(
@@ -112,7 +135,7 @@ async def start(update: Update, context: CallbackContext):
 
 async def check_user(tg_id):
     """Check if the user exists in the database."""
-    response = requests.get(f"{API_ENDPOINT}/stockxusers/?tg_id={tg_id}")
+    response = await api.get("/stockxusers/", params={"tg_id": tg_id})
     if response.status_code == 200:
         return response.json()
     else:
@@ -142,7 +165,7 @@ async def create_store_confirm(update: Update, context: CallbackContext):
             user_id = user_data['id']
             store_name = context.user_data['store_name']
             # Call the API to create the store
-            response = requests.post(f"{API_ENDPOINT}/storeuser/create/", json={"role": "", "store": store_name, "user": user_id})
+            response = await api.post("/storeuser/create/", json={"role": "", "store": store_name, "user": user_id})
             if response.status_code == 200:
                 await update.message.reply_text("Store created successfully!")
             else:
@@ -157,10 +180,9 @@ async def create_store_confirm(update: Update, context: CallbackContext):
 async def start_slider(update: Update, context: CallbackContext):
     # Fetch data from the endpoint
     DEFAULT_IMAGE_URL = "https://simbakids.netlify.app/_nuxt/img/simbakidslogo.104a990.png"
-    response = requests.get(f"{API_ENDPOINT}/stocks/")
-    if response.status_code == 200:
-        stocks = response.json()
-    else:
+    try:
+        stocks = await stock_replica.rows()
+    except httpx.HTTPError:
         await update.message.reply_text("Failed to fetch product data.")
         return
     
@@ -334,7 +356,7 @@ async def add_product_image(update: Update, context: CallbackContext) -> int:
         await message.reply_text(msg, reply_markup=reply_markup)
         message = update.message
         # Proceed with the conversation
-        categories = requests.get(f"{API_ENDPOINT}/categories/").json()
+        categories = await reference_data.all('categories')
         categories_keyboard = [
             [InlineKeyboardButton(category['name'], callback_data=category['id'])]
             for category in categories
@@ -356,7 +378,7 @@ async def add_product_category(update: Update, context: CallbackContext) -> int:
     msg = (
         "Choose a brand:"
     )
-    brands = requests.get(f"{API_ENDPOINT}/brands/").json()
+    brands = await reference_data.all('brands')
     brands_keyboard = [
         [InlineKeyboardButton(brand['name'], callback_data=brand['id'])]
         for brand in brands
@@ -374,7 +396,7 @@ async def add_product_brand(update: Update, context: CallbackContext) -> int:
     msg = (
         "Choose Size Range:"
     )
-    sizes = requests.get(f"{API_ENDPOINT}/size-ranges/").json()
+    sizes = await reference_data.all('size_ranges')
     sizes_keyboard = [
         [InlineKeyboardButton(f"{size['name']}: {size['size_value']}" , callback_data=size['id'])]
         for size in sizes
@@ -386,12 +408,7 @@ async def add_product_brand(update: Update, context: CallbackContext) -> int:
 async def add_product_size(update: Update, context: CallbackContext) -> int:
     """Store product size and ask for product color."""
     size_id = update.callback_query.data
-    sizes = requests.get(f"{API_ENDPOINT}/size-ranges/").json()
-    selected_size = None
-    for size in sizes:
-        if int(size['id']) == int(size_id):
-            selected_size = size
-            break
+    selected_size = await reference_data.get('size_ranges', size_id)
     
     if selected_size:
         context.user_data['size'] = selected_size
@@ -401,7 +418,7 @@ async def add_product_size(update: Update, context: CallbackContext) -> int:
     msg = (
             "Choose color (multiple selections allowed):"
            )
-    colors = requests.get(f"{API_ENDPOINT}/colors/").json()
+    colors = await reference_data.all('colors')
     colors_keyboard = [
         [InlineKeyboardButton(color['name'], callback_data=color['id'])]
         for color in colors
@@ -415,8 +432,8 @@ async def add_product_color(update: Update, context: CallbackContext) -> int:
     color_id = update.callback_query.data
     user_data = context.user_data
     user_colors = context.user_data.get('colors', [])
-    # Fetch colors from API endpoint
-    colors = requests.get(f"{API_ENDPOINT}/colors/").json()
+    # Colors come from the local reference cache, so a toggle costs no API call
+    colors = await reference_data.all('colors')
     msg = (
             "Choose color (multiple selections allowed):"
            )
@@ -444,7 +461,7 @@ async def add_product_color(update: Update, context: CallbackContext) -> int:
                 'store': user_data['user']['store'],  # 'store' is the ID of the store associated with the user
                 'created_by': update.callback_query.message.chat.username
             }
-            response = requests.post(f"{API_ENDPOINT}/products/create/", json=product_data)
+            response = await api.post("/products/create/", json=product_data)
             if response.status_code == 201:
                 # Product created successfully
                 product_details = "\n".join([f"{key}: {value}" for key, value in product_data.items() if key != 'colors'])
@@ -511,8 +528,8 @@ async def cancel_add_product(update: Update, context: CallbackContext) -> int:
 async def start_sale(update: Update, context: CallbackContext) -> int:
     """Start the sale conversation and prompt user to choose a category."""
     try:
-        # Fetch categories from the API
-        categories = requests.get(f"{API_ENDPOINT}/categories/").json()
+        # Fetch categories from the reference cache
+        categories = await reference_data.all('categories')
         
         # Create a list of InlineKeyboardButtons for categories
         category_buttons = [
@@ -538,13 +555,10 @@ async def select_sale_category(update: Update, context: CallbackContext) -> int:
     category_id = int(query.data)
     try:
         # Fetch products belonging to the selected category from the API
-        # response = requests.get(f"{API_ENDPOINT}/categories/{category_id}/products/")
-        response = requests.get(f"{API_ENDPOINT}/stocks/")
-
-        response.raise_for_status()  # Raise an error for non-2xx status codes
+        # response = await api.get(f"/categories/{category_id}/products/")
         products = []
         
-        for pro in response.json():
+        for pro in await stock_summary_replica.rows():
             if pro['product']['category']['id'] == category_id:
                 products.append(pro['product'])        
         # Store products in the given category in user_data for further processing
@@ -677,36 +691,37 @@ async def finalize_sale(update: Update, context: CallbackContext) -> int:
         context.user_data.pop('selected_products_quantities', None)
         return ConversationHandler.END
     
-    # Generate the JSON object appropriate for the POST request
+    # Record every product of the basket with a single request (all lines or none)
     selected_products_quantities = context.user_data.get('selected_products_quantities', {})
+    product_names = {product['id']: f"{product['name']} - {product['code']}" for product in context.user_data.get('products', [])}
     sale_data = {
-        "products": [
-            {"product_id": product_id, "quantity": quantity}
+        "sold_by": update.callback_query.message.chat.username,
+        "lines": [
+            {"product": product_id, "quantity_sold": quantity}
             for product_id, quantity in selected_products_quantities.items()
-        ]
+        ],
     }
+    response = await api.post("/sales/cart/", json=sale_data)
+    # A proxy or server error page isn't JSON, report it by its status instead
+    is_json = response.headers.get("content-type", "").startswith("application/json")
+    result = response.json() if is_json else {}
     
-    """
-   {'quantity_sold': ['This field is required.'], 'soled_by': ['This field is required.'], 'product': ['This field is required.']}
-    
-    """
-    
-    for product_id, quantity in selected_products_quantities.items():
-        sale_data['quantity_sold'] = quantity
-        sale_data['sold_by'] = update.callback_query.message.chat.username
-        sale_data['product'] = product_id
-        sale_data['store'] = context.user_data['user']['store']
-        response = requests.post(f"{API_ENDPOINT}/sales/create/", json=sale_data)
-        if response.status_code == 201:
-            await update.callback_query.message.reply_text(f"✅ Sale recorded for {product_id}.")
+    if response.status_code == 201 and is_json:
+        lines = [f"✅ Sale recorded for {product_names.get(line['product'], line['product'])} ({line['quantity_sold']})" for line in result['lines']]
+        await update.callback_query.message.reply_text("\n".join(lines))
+        status_text = "Sale finalized successfully."
+    else:
+        # The cart endpoint reports which lines were rejected; nothing was recorded
+        rejected = [line for line in result.get('lines', []) if isinstance(line, dict) and line.get('error')]
+        if rejected:
+            lines = [f"❌ {product_names.get(line['product'], line['product'])}: {line['error']}" for line in rejected]
+            await update.callback_query.message.reply_text("Sale not recorded, no product was sold.\n" + "\n".join(lines))
         else:
-            await update.callback_query.message.reply_text(f"❌ Failed to record sale for {product_id}. Error: {response.status_code} {response.json()}")
-    # Example: Send a POST request with the sale data
-    # response = requests.post(f"{API_ENDPOINT}/sales/create/", json=sale_data)
-    # Handle the response accordingly
+            await update.callback_query.message.reply_text(f"❌ Failed to record sale. Error: {response.status_code} {result or response.reason_phrase}")
+        status_text = "Sale failed."
     
-    # Remove the inline keyboard and replace the message with a success message and end the conversation
-    await query.message.edit_text("Sale finalized successfully.")
+    # Remove the inline keyboard and replace the message with the outcome and end the conversation
+    await query.message.edit_text(status_text)
     # await update.callback_query.message.reply_text()
     context.user_data.pop('selected_products', None)
     context.user_data.pop('products', None)
@@ -733,7 +748,7 @@ async def start_stock_update(update: Update, context: CallbackContext) -> int:
     try:
         user = context.user_data['user']
         # Fetch products along with their current stock on hand quantities from the API
-        stocks = requests.get(f"{API_ENDPOINT}/stocks/", data=user).json()
+        stocks = await stock_summary_replica.rows(data=user)
         
         # Extract product information from each stock entry
         products = [
@@ -778,8 +793,7 @@ async def select_stock_product(update: Update, context: CallbackContext) -> int:
         # Add new stock option selected, prompt user to select a product from the list of all products
         try:
             # Fetch all products from the products enpoint and from stocks endpoint then pick the ones that are not in stocks
-            products = requests.get(f"{API_ENDPOINT}/products/", data=udata).json()
-            stocks = requests.get(f"{API_ENDPOINT}/stocks/", data=udata).json()
+            products, stocks = await asyncio.gather(product_replica.rows(data=udata), stock_summary_replica.rows(data=udata))
             # generate new products dict from the products list and stocks list thar are not in stocks
             new_products = [product for product in products if product['id'] not in [stock['product']['id'] for stock in stocks]]
             # if there are no new products, go to the else block instead of ending the conversation
@@ -836,7 +850,7 @@ async def update_stock_quantity(update: Update, context: CallbackContext) -> int
             "user": udata
         }
         # Update stock using the API
-        response = requests.put(f"{API_ENDPOINT}/stocks/update/", json=stock_update_data)
+        response = await api.put("/stocks/update/", json=stock_update_data)
         
         if response.status_code == 200:
             updated_stock = response.json()
@@ -859,7 +873,7 @@ async def add_new_stock(update: Update, context: CallbackContext) -> int:
     product_id = int(query.data)
     try:
         # Fetch the selected product details from the API
-        product_details = requests.get(f"{API_ENDPOINT}/products/{product_id}/").json()
+        product_details = (await api.get(f"/products/{product_id}/")).json()
         # Store the selected product details in user_data for further processing
         context.user_data['selected_product'] = product_details
         # Prompt the user to enter the quantity for adding new stock
@@ -892,7 +906,7 @@ async def add_new_stock_quantity(update: Update, context: CallbackContext) -> in
             "store": context.user_data['user']['store']
         }
         # Add new stock using the API
-        response = requests.post(f"{API_ENDPOINT}/stocks/create/", json=stock_data)
+        response = await api.post("/stocks/create/", json=stock_data)
         if response.status_code == 201:
             new_stock = response.json()
             await update.message.reply_text(f"✅ New stock added successfully. \nTotal on hand quantity for {selected_product['name']} - {selected_product['code']}: {new_stock['stock_on_hand']}")
@@ -913,308 +927,14 @@ async def cancel_stock_update(update: Update, context: CallbackContext) -> int:
     context.user_data.pop('selected_product', None)
     context.user_data.pop('stocks', None)
     return ConversationHandler.END
-    
 
-import matplotlib.pyplot as plt
-import numpy as np
-import io
-from datetime import datetime, timedelta
-
-def generate_bar_chart(report_data):
-    labels = ['Stock In', 'Stock Out', 'Stock On Hand']
-    values = [report_data['total_stock_in'], report_data['total_stock_out'] * -1, report_data['total_stock_on_hand']]
-
-    # Define custom colors for the bars
-    colors = ['#1f77b4', '#ff7f0e', '#2ca02c']
-
-    # Create a bar chart to visualize the stock in, stock out, and stock on hand data
-    fig, ax = plt.subplots(figsize=(10, 6))
-    x = np.arange(len(labels))
-    bars = ax.bar(x, values, color=colors)
-    ax.set_xlabel('Stock Type')
-    ax.set_ylabel('Quantity')
-    ax.set_title('Total Stock In vs Stock Out vs Stock On Hand')
-    ax.set_xticks(x)
-    ax.set_xticklabels(labels)
-
-    # Add the data labels on top of the bars
-    for bar in bars:
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width() / 2, height + 10, str(height), ha='center', va='bottom')
-
-    # Save the bar chart visualization as bytes in memory
-    buf_bar = io.BytesIO()
-    plt.savefig(buf_bar, format='png')
-    plt.close()  # Close the figure to free memory
-    buf_bar.seek(0)
-
-    return buf_bar
-
-
-def generate_top_ten_products_bar_chart(sales_data):
-    # Count the total quantity sold for each product
-    product_sales = defaultdict(int)
-    for transaction in sales_data:
-        product_id = transaction['product']['code']
-        quantity_sold = float(transaction['quantity_sold'])
-        product_sales[product_id] += quantity_sold
-
-    # Sort the products based on total quantity sold and select the top ten
-    top_ten_products = sorted(product_sales.items(), key=lambda x: x[1], reverse=True)[:10]
-    product_ids, quantities_sold = zip(*top_ten_products)
-    
-    # Fetch product names from the API endpoint (assuming there's an endpoint to fetch product details)
-    product_names = {}  # This dictionary should contain product names fetched from the API
-    
-    # Define custom colors for the bars
-    colors = plt.cm.tab10(np.arange(len(product_ids)))
-
-    # Create bar chart
-    fig, ax = plt.subplots(figsize=(10, 6))
-    bars = ax.bar(product_ids, quantities_sold, tick_label=[product_names.get(product_id, f' {product_id} ') for product_id in product_ids], color=colors)
-    ax.set_xlabel('Product')
-    ax.set_ylabel('Total Quantity Sold')
-    ax.set_title('Top Ten Products by Sales Quantity')
-    ax.grid(True)
-    plt.xticks(rotation=45)
-
-    # Add the data labels on top of the bars
-    for bar, quantity in zip(bars, quantities_sold):
-        ax.text(bar.get_x() + bar.get_width() / 2, quantity + 10, str(quantity), ha='center', va='bottom')
-
-    # Save the bar chart visualization as bytes in memory
-    buf_bar_chart = io.BytesIO()
-    plt.savefig(buf_bar_chart, format='png')
-    plt.close()  # Close the figure to free memory
-    buf_bar_chart.seek(0)
-
-    return buf_bar_chart
-
-      
-       
-def generate_stock_bar_charts(API_ENDPOINT):
-    # Fetch data from the /stock-transactions/ endpoint
-    stock_transactions_response = requests.get(f"{API_ENDPOINT}/stock-transactions/")
-    stock_transactions = stock_transactions_response.json()
-
-    # Fetch data from the /stocks-list/ endpoint
-    stocks_list_response = requests.get(f"{API_ENDPOINT}/stocks/")
-    stocks_list = stocks_list_response.json()
-
-    # Group stock transactions by product
-    stock_transactions_by_product = {}
-    for transaction in stock_transactions:
-        product_code = transaction['product']['code']
-        if product_code not in stock_transactions_by_product:
-            stock_transactions_by_product[product_code] = []
-        stock_transactions_by_product[product_code].append(transaction)
-
-    # Aggregate stock transactions to calculate stock in, stock out, and on-hand quantity for each product
-    product_data = {}
-    for stock_item in stocks_list:
-        product_code = stock_item['product']['code']
-        stock_in = 0
-        stock_out = 0
-        for transaction in stock_transactions_by_product.get(product_code, []):
-            if transaction['stock_type'] == '1':  # Stock in
-                stock_in += transaction['quantity']
-            elif transaction['stock_type'] == '2':  # Stock out
-                stock_out += abs(transaction['quantity'])  # Take absolute value for stock out
-        stock_on_hand = stock_item['stock_on_hand']
-        product_data[product_code] = {'stock_in': stock_in, 'stock_out': stock_out, 'stock_on_hand': stock_on_hand}
-
-    # Prepare data for the grouped bar charts
-    product_codes = list(product_data.keys())
-    num_products = len(product_codes)
-
-    # Determine the number of charts based on the number of products
-    num_charts = max((num_products + 5) // 6, 1)  # Calculate the number of charts required, ensuring at least 1 chart
-
-    # Generate charts for each group of products
-    charts = []
-    start_index = 0
-    for i in range(num_charts):
-        end_index = min(start_index + 6, num_products)  # Ensure end_index does not exceed num_products
-        group_product_codes = product_codes[start_index:end_index]
-        group_product_data = {code: product_data[code] for code in group_product_codes}
-
-        # Prepare data for the grouped bar chart
-        group_labels = [f'{code}' for code in group_product_codes]
-        group_stock_in_values = [group_product_data[code]['stock_in'] for code in group_product_codes]
-        group_stock_out_values = [group_product_data[code]['stock_out'] for code in group_product_codes]
-        group_stock_on_hand_values = [group_product_data[code]['stock_on_hand'] for code in group_product_codes]
-
-        # Plot the grouped bar chart for the current group
-        fig, ax = plt.subplots()
-        x = np.arange(len(group_labels))
-        width = 0.2  # Width of each bar
-        rects1 = ax.bar(x - width, group_stock_in_values, width, label='Stock In')
-        rects2 = ax.bar(x, group_stock_out_values, width, label='Stock Out')
-        rects3 = ax.bar(x + width, group_stock_on_hand_values, width, label='Stock On Hand')
-
-        ax.set_xlabel('Product Code')
-        ax.set_ylabel('Quantity')
-        ax.set_title('Stock Transactions by Product')
-        ax.set_xticks(x)
-        ax.set_xticklabels(group_labels)
-        ax.legend()
-
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-
-        # Annotate each bar with its respective value
-        for rects in [rects1, rects2, rects3]:
-            for rect in rects:
-                height = rect.get_height()
-                ax.annotate('{}'.format(height),
-                            xy=(rect.get_x() + rect.get_width() / 2, height),
-                            xytext=(0, 3),  # 3 points vertical offset
-                            textcoords="offset points",
-                            ha='center', va='bottom', rotation=90)  # Rotate the annotation text vertically
-
-        # Save the plot as a PNG image
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close()
-        buf.seek(0)
-        charts.append(buf)
-
-        start_index += 6
-
-    return charts
-
-
-
-def generate_sales_time_series_chart(sales_data, start_date=None, end_date=None, product_codes=None):
-    # If no filters are provided, use the entire sales dataset
-    if start_date is None and end_date is None and product_codes is None:
-        filtered_sales_data = sales_data
-    else:
-        # Apply filters to sales data
-        filtered_sales_data = []
-        for transaction in sales_data:
-            transaction_date = datetime.strptime(transaction['created_at'][:10], '%Y-%m-%d')
-            if (start_date is None or transaction_date >= start_date) and \
-               (end_date is None or transaction_date <= end_date) and \
-               (product_codes is None or transaction['product']['code'] in product_codes):
-                filtered_sales_data.append(transaction)
-        # Extract all unique product codes from filtered data
-        product_codes = {transaction['product']['code'] for transaction in filtered_sales_data}
-
-        # Create a dictionary to store sales data by product and date
-        product_sales_by_date = {product_code: defaultdict(int) for product_code in product_codes}
-
-        # Extract all unique dates and convert them to a sorted list
-        all_dates = sorted(set(transaction['created_at'][:10] for transaction in filtered_sales_data))
-
-        # Determine the earliest and latest dates
-        earliest_date = min(all_dates)
-        latest_date = max(all_dates)
-
-        # Create a list of all dates between the earliest and latest date
-        all_dates_full = [datetime.strptime(earliest_date, '%Y-%m-%d') + timedelta(days=i) for i in range((datetime.strptime(latest_date, '%Y-%m-%d') - datetime.strptime(earliest_date, '%Y-%m-%d')).days + 1)]
-        all_dates_full = [date.strftime('%m-%d') for date in all_dates_full]
-
-        # Initialize quantities sold for each date and product to 0
-        for product_code in product_codes:
-            for date in all_dates_full:
-                product_sales_by_date[product_code][date] = 0
-
-        # Populate the dictionary with actual sales data
-        for transaction in filtered_sales_data:
-            product_code = transaction['product']['code']
-            date = transaction['created_at'][:10]  # Extracting only the date portion
-            quantity_sold = int(transaction['quantity_sold'])
-            product_sales_by_date[product_code][date] += quantity_sold
-
-        # Plot a line chart for each product
-        fig, ax = plt.subplots(figsize=(10, 6))
-        for product_code, sales_by_date in product_sales_by_date.items():
-            sales_for_product = []
-            for date in all_dates_full:
-                quantity = sales_by_date[date]
-                sales_for_product.append(quantity)
-                ax.scatter(date, quantity, color='#0ADD08')  # Display quantity sold as dots
-                ax.annotate(quantity, (date, quantity), textcoords="offset points", xytext=(0,10), ha='center')  # Annotate the dot with quantity sold
-            ax.plot(all_dates_full, sales_for_product, linestyle='-', label=f'Product {product_code}')
-
-        ax.set_xlabel('Date')
-        ax.set_ylabel('Quantity Sold')
-        ax.set_title('Product Sales Over Time')
-        ax.legend()
-        ax.grid(True)
-        plt.xticks(rotation=45)
-
-        # Save the line chart visualization as bytes in memory
-        buf_line_chart = io.BytesIO()
-        plt.savefig(buf_line_chart, format='png')
-        plt.close()  # Close the figure to free memory
-        buf_line_chart.seek(0)
-
-        return buf_line_chart
-
-def generate_sales_time_series_chart(sales_data):
-    # Extract all unique product codes
-    product_codes = {transaction['product']['code'] for transaction in sales_data}
-
-    # Create a dictionary to store sales data by product and date
-    product_sales_by_date = {product_code: defaultdict(int) for product_code in product_codes}
-
-    # Extract all unique dates and convert them to a sorted list
-    all_dates = sorted(set(transaction['created_at'][:10] for transaction in sales_data))
-
-    # Determine the earliest and latest dates
-    earliest_date = min(all_dates)
-    latest_date = max(all_dates)
-
-    # Create a list of all dates between the earliest and latest date
-    all_dates_full = [datetime.strptime(earliest_date, '%Y-%m-%d') + timedelta(days=i) for i in range((datetime.strptime(latest_date, '%Y-%m-%d') - datetime.strptime(earliest_date, '%Y-%m-%d')).days + 1)]
-    all_dates_full = [date.strftime('%Y-%m-%d') for date in all_dates_full]
-
-    # Initialize quantities sold for each date and product to 0
-    for product_code in product_codes:
-        for date in all_dates_full:
-            product_sales_by_date[product_code][date] = 0
-
-    # Populate the dictionary with actual sales data
-    for transaction in sales_data:
-        product_code = transaction['product']['code']
-        date = transaction['created_at'][:10]  # Extracting only the date portion
-        quantity_sold = int(transaction['quantity_sold'])
-        product_sales_by_date[product_code][date] += quantity_sold
-
-    # Plot a line chart for each product
-    fig, ax = plt.subplots(figsize=(10, 6))
-    for product_code, sales_by_date in product_sales_by_date.items():
-        sales_for_product = []
-        for date in all_dates_full:
-            quantity = sales_by_date[date]
-            sales_for_product.append(quantity)
-            ax.scatter(date, quantity, color= '#0ADD08')  # Display quantity sold as dots
-            ax.annotate(quantity, (date, quantity), textcoords="offset points", xytext=(0,10), ha='center')  # Annotate the dot with quantity sold
-        ax.plot(all_dates_full, sales_for_product, linestyle='-', label=f'Product {product_code}')
-
-    ax.set_xlabel('Date')
-    ax.set_ylabel('Quantity Sold')
-    ax.set_title('Product Sales Over Time')
-    ax.legend()
-    ax.grid(True)
-    plt.xticks(rotation=45)
-
-    # Save the line chart visualization as bytes in memory
-    buf_line_chart = io.BytesIO()
-    plt.savefig(buf_line_chart, format='png')
-    plt.close()  # Close the figure to free memory
-    buf_line_chart.seek(0)
-
-    return buf_line_chart
 
 # Define a command handler for the /reports command
 async def reports(update: Update, context: CallbackContext) -> None:
     """Fetch and display reports."""
     try:
         # Fetch report data from the API endpoint
-        response = requests.get(f"{API_ENDPOINT}/reports/")
+        response = await api.get("/reports/")
         response.raise_for_status()  # Raise an error for non-2xx status codes
 
         # Parse the JSON response
@@ -1222,17 +942,8 @@ async def reports(update: Update, context: CallbackContext) -> None:
 
         # Process and visualize the report data
         if report_data:
-            # Generate the bar chart visualization
-            buf_bar = generate_bar_chart(report_data)
-            # Send the bar chart visualization to the user with a caption
-            # await update.message.reply_photo(buf_bar, caption="Bar Chart: Stock In vs Stock Out")
-
             # Fetch sales transaction data from the API endpoint
-            sales_response = requests.get(f"{API_ENDPOINT}/sales-transactions/")
-            sales_response.raise_for_status()  # Raise an error for non-2xx status codes
-
-            # Parse the JSON response for sales transactions
-            sales_data = sales_response.json()
+            sales_data = await api.get_all_normalized("/sales-transactions/", params={"page_size": 1000, "fields": "created_at,quantity_sold,product"})
 
             # Process and visualize the sales transaction data
             if sales_data:
@@ -1243,19 +954,21 @@ async def reports(update: Update, context: CallbackContext) -> None:
                 # await update.message.reply_photo(buf_sales_chart, caption="Total Sales Quantity for Each Product")
                 
 
-                # Generate the line chart visualization for product sales over time
-                buf_line_chart = generate_sales_time_series_chart(sales_data)
-                # Send the line chart visualization to the user with a caption
-                # await update.message.reply_photo(buf_line_chart, caption="Product Sales Over Time")
-
-                    # Generate the top ten products bar chart visualization
-                buf_top_ten_products_bar_chart = generate_top_ten_products_bar_chart(sales_data)
-                # Send the top ten products bar chart visualization to the user with a caption
-                # await update.message.reply_photo(buf_top_ten_products_bar_chart, caption="Bar Chart: Top Ten Products by Sales Quantity")
+                # Render the sales over time line chart and the top ten products bar chart in parallel;
+                # the line chart shows the best sellers and labels the largest values, so a year of
+                # history for hundreds of products stays readable and renders in well under a second
+                buf_line_chart, buf_top_ten_products_bar_chart = await asyncio.gather(
+                    renderer.render(generate_sales_time_series_chart, sales_data, max_series=SALES_CHART_MAX_SERIES, max_annotations=SALES_CHART_MAX_ANNOTATIONS),
+                    renderer.render(generate_top_ten_products_bar_chart, sales_data),
+                )
                 
                 # Send Grouped charts as an album with a singl caption
                 images = [InputMediaPhoto(media=buf_line_chart), InputMediaPhoto(media=buf_top_ten_products_bar_chart)]
-                caption = "Sales Reports (Total Sales Quantity for Each Product, Product Sales Over Time, Top Ten Products by Sales Quantity)"
+                caption = (
+                    "Sales Reports (Total Sales Quantity for Each Product, "
+                    f"Product Sales Over Time: top {SALES_CHART_MAX_SERIES} products, the rest as \"Other products\", largest {SALES_CHART_MAX_ANNOTATIONS} values labelled, "
+                    "Top Ten Products by Sales Quantity)"
+                )
                 
                 await update.message.reply_media_group(media=images, caption=caption)
                 
@@ -1264,16 +977,17 @@ async def reports(update: Update, context: CallbackContext) -> None:
                 await update.message.reply_text("No sales transaction data available.")            
 
             # Fetch stock data from the API endpoint
-            stock_response = requests.get(f"{API_ENDPOINT}/stocks/")
-            stock_response.raise_for_status()  # Raise an error for non-2xx status codes
-            
-            # Parse the JSON response for stock data
-            stock_data = stock_response.json()
+            stock_data = await stock_summary_replica.rows()
 
             # Process and visualize the stock data
             if stock_data:
                 # Generate the bar chart visualizations for stock products
-                charts = generate_stock_bar_charts(API_ENDPOINT)
+                stock_transactions = await api.get_all_normalized("/stock-transactions/", params={"page_size": 1000, "fields": "quantity,stock_type,product"})
+                # Render the per product charts and the stock in/out/on hand bar chart in parallel
+                charts, buf_bar = await asyncio.gather(
+                    renderer.render(generate_stock_bar_charts, stock_transactions, stock_data),
+                    renderer.render(generate_bar_chart, report_data),
+                )
                 if charts:
                     # Open each bar chart image and append it to a list
                     images = [InputMediaPhoto(media=chart) for chart in charts]
@@ -1304,6 +1018,9 @@ async def reports(update: Update, context: CallbackContext) -> None:
         else:
             await update.message.reply_text("No report data available.")
 
+    except RenderQueueFull as e:
+        logger.warning(f"Report rendering rejected: {e}")
+        await update.message.reply_text("Reports are busy right now. Please try again in a moment.")
     except Exception as e:
         logger.error(f"Error fetching or displaying reports: {e}")
         await update.message.reply_text("An error occurred while fetching or displaying reports. Please try again later.")
@@ -1330,10 +1047,21 @@ async def cancel(update: Update, context: CallbackContext) -> int:
     )
     return ConversationHandler.END
 
+async def warm_up(application: Application) -> None:
+    """Load the reference data cache and chart workers before the bot starts polling."""
+    await reference_data.start()
+    await renderer.start()
+
+async def shut_down(application: Application) -> None:
+    """Release the API connection pool and chart workers when the bot shuts down."""
+    await reference_data.stop()
+    await renderer.close()
+    await api.close()
+
 def main():
     """Start the bot."""
     # Create the application and pass the bot token to it
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = Application.builder().token(BOT_TOKEN).post_init(warm_up).post_shutdown(shut_down).build()
     # Create a conversation handler for adding a product
     add_product_handler = ConversationHandler(
         entry_points=[MessageHandler(filters.Regex(r"^Add a Product$") & ~filters.COMMAND, start_add_product)],
@@ -0,0 +1,247 @@
+from collections import defaultdict
+import io
+
+import matplotlib
+matplotlib.use('Agg')  # Charts are rendered off-screen, often in worker processes
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+def generate_bar_chart(report_data):
+    labels = ['Stock In', 'Stock Out', 'Stock On Hand']
+    values = [report_data['total_stock_in'], report_data['total_stock_out'] * -1, report_data['total_stock_on_hand']]
+
+    # Define custom colors for the bars
+    colors = ['#1f77b4', '#ff7f0e', '#2ca02c']
+
+    # Create a bar chart to visualize the stock in, stock out, and stock on hand data
+    fig, ax = plt.subplots(figsize=(10, 6))
+    x = np.arange(len(labels))
+    bars = ax.bar(x, values, color=colors)
+    ax.set_xlabel('Stock Type')
+    ax.set_ylabel('Quantity')
+    ax.set_title('Total Stock In vs Stock Out vs Stock On Hand')
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels)
+
+    # Add the data labels on top of the bars
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width() / 2, height + 10, str(height), ha='center', va='bottom')
+
+    # Save the bar chart visualization as bytes in memory
+    buf_bar = io.BytesIO()
+    plt.savefig(buf_bar, format='png')
+    plt.close()  # Close the figure to free memory
+    buf_bar.seek(0)
+
+    return buf_bar
+
+
+def generate_top_ten_products_bar_chart(sales_data):
+    # Count the total quantity sold for each product
+    product_sales = defaultdict(int)
+    for transaction in sales_data:
+        product_id = transaction['product']['code']
+        quantity_sold = float(transaction['quantity_sold'])
+        product_sales[product_id] += quantity_sold
+
+    # Sort the products based on total quantity sold and select the top ten
+    top_ten_products = sorted(product_sales.items(), key=lambda x: x[1], reverse=True)[:10]
+    product_ids, quantities_sold = zip(*top_ten_products)
+    
+    # Fetch product names from the API endpoint (assuming there's an endpoint to fetch product details)
+    product_names = {}  # This dictionary should contain product names fetched from the API
+    
+    # Define custom colors for the bars
+    colors = plt.cm.tab10(np.arange(len(product_ids)))
+
+    # Create bar chart
+    fig, ax = plt.subplots(figsize=(10, 6))
+    bars = ax.bar(product_ids, quantities_sold, tick_label=[product_names.get(product_id, f' {product_id} ') for product_id in product_ids], color=colors)
+    ax.set_xlabel('Product')
+    ax.set_ylabel('Total Quantity Sold')
+    ax.set_title('Top Ten Products by Sales Quantity')
+    ax.grid(True)
+    plt.xticks(rotation=45)
+
+    # Add the data labels on top of the bars
+    for bar, quantity in zip(bars, quantities_sold):
+        ax.text(bar.get_x() + bar.get_width() / 2, quantity + 10, str(quantity), ha='center', va='bottom')
+
+    # Save the bar chart visualization as bytes in memory
+    buf_bar_chart = io.BytesIO()
+    plt.savefig(buf_bar_chart, format='png')
+    plt.close()  # Close the figure to free memory
+    buf_bar_chart.seek(0)
+
+    return buf_bar_chart
+
+      
+       
+def generate_stock_bar_charts(stock_transactions, stocks_list):
+    # stock_transactions and stocks_list are the parsed /stock-transactions/ and /stocks/ responses
+    # Group stock transactions by product
+    stock_transactions_by_product = {}
+    for transaction in stock_transactions:
+        product_code = transaction['product']['code']
+        if product_code not in stock_transactions_by_product:
+            stock_transactions_by_product[product_code] = []
+        stock_transactions_by_product[product_code].append(transaction)
+
+    # Aggregate stock transactions to calculate stock in, stock out, and on-hand quantity for each product
+    product_data = {}
+    for stock_item in stocks_list:
+        product_code = stock_item['product']['code']
+        stock_in = 0
+        stock_out = 0
+        for transaction in stock_transactions_by_product.get(product_code, []):
+            if transaction['stock_type'] == '1':  # Stock in
+                stock_in += transaction['quantity']
+            elif transaction['stock_type'] == '2':  # Stock out
+                stock_out += abs(transaction['quantity'])  # Take absolute value for stock out
+        stock_on_hand = stock_item['stock_on_hand']
+        product_data[product_code] = {'stock_in': stock_in, 'stock_out': stock_out, 'stock_on_hand': stock_on_hand}
+
+    # Prepare data for the grouped bar charts
+    product_codes = list(product_data.keys())
+    num_products = len(product_codes)
+
+    # Determine the number of charts based on the number of products
+    num_charts = max((num_products + 5) // 6, 1)  # Calculate the number of charts required, ensuring at least 1 chart
+
+    # Generate charts for each group of products
+    charts = []
+    start_index = 0
+    for i in range(num_charts):
+        end_index = min(start_index + 6, num_products)  # Ensure end_index does not exceed num_products
+        group_product_codes = product_codes[start_index:end_index]
+        group_product_data = {code: product_data[code] for code in group_product_codes}
+
+        # Prepare data for the grouped bar chart
+        group_labels = [f'{code}' for code in group_product_codes]
+        group_stock_in_values = [group_product_data[code]['stock_in'] for code in group_product_codes]
+        group_stock_out_values = [group_product_data[code]['stock_out'] for code in group_product_codes]
+        group_stock_on_hand_values = [group_product_data[code]['stock_on_hand'] for code in group_product_codes]
+
+        # Plot the grouped bar chart for the current group
+        fig, ax = plt.subplots()
+        x = np.arange(len(group_labels))
+        width = 0.2  # Width of each bar
+        rects1 = ax.bar(x - width, group_stock_in_values, width, label='Stock In')
+        rects2 = ax.bar(x, group_stock_out_values, width, label='Stock Out')
+        rects3 = ax.bar(x + width, group_stock_on_hand_values, width, label='Stock On Hand')
+
+        ax.set_xlabel('Product Code')
+        ax.set_ylabel('Quantity')
+        ax.set_title('Stock Transactions by Product')
+        ax.set_xticks(x)
+        ax.set_xticklabels(group_labels)
+        ax.legend()
+
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+
+        # Annotate each bar with its respective value
+        for rects in [rects1, rects2, rects3]:
+            for rect in rects:
+                height = rect.get_height()
+                ax.annotate('{}'.format(height),
+                            xy=(rect.get_x() + rect.get_width() / 2, height),
+                            xytext=(0, 3),  # 3 points vertical offset
+                            textcoords="offset points",
+                            ha='center', va='bottom', rotation=90)  # Rotate the annotation text vertically
+
+        # Save the plot as a PNG image
+        buf = io.BytesIO()
+        plt.savefig(buf, format='png')
+        plt.close()
+        buf.seek(0)
+        charts.append(buf)
+
+        start_index += 6
+
+    return charts
+
+
+
+def aggregate_sales_by_day(sales_data, start_date=None, end_date=None, product_codes=None):
+    """Accumulate quantities sold into a products x days matrix.
+
+    Returns (product_codes, dates, matrix) where `dates` is a contiguous
+    datetime64[D] range from the first to the last sale day and
+    matrix[i, j] is the quantity of product_codes[i] sold on dates[j].
+    """
+    codes = np.array([transaction['product']['code'] for transaction in sales_data], dtype=str)
+    days = np.array([transaction['created_at'][:10] for transaction in sales_data], dtype='datetime64[D]')
+    quantities = np.array([int(transaction['quantity_sold']) for transaction in sales_data], dtype=np.int64)
+
+    # Apply the optional filters to all transactions at once
+    mask = np.ones(len(codes), dtype=bool)
+    if start_date is not None:
+        mask &= days >= np.datetime64(start_date, 'D')
+    if end_date is not None:
+        mask &= days <= np.datetime64(end_date, 'D')
+    if product_codes is not None:
+        mask &= np.isin(codes, list(product_codes))
+    codes, days, quantities = codes[mask], days[mask], quantities[mask]
+
+    if not len(codes):
+        return np.array([], dtype=str), np.array([], dtype='datetime64[D]'), np.zeros((0, 0), dtype=np.int64)
+
+    unique_codes, product_index = np.unique(codes, return_inverse=True)
+    first_day = days.min()
+    day_index = (days - first_day).astype(np.int64)
+    num_days = int(day_index.max()) + 1
+
+    # One bincount over the flattened (product, day) cell index
+    matrix = np.bincount(product_index * num_days + day_index, weights=quantities, minlength=len(unique_codes) * num_days)
+    matrix = matrix.astype(np.int64).reshape(len(unique_codes), num_days)
+    return unique_codes, first_day + np.arange(num_days), matrix
+
+
+def generate_sales_time_series_chart(sales_data, start_date=None, end_date=None, product_codes=None, max_series=None, max_annotations=None):
+    """Plot one line per product (by default) of its quantity sold per day.
+
+    `max_series` plots only that many best sellers and folds the rest into an
+    "Other products" line; `max_annotations` labels only that many of the
+    largest points. Both are off by default, so every product and point shows.
+    """
+    product_codes, dates, matrix = aggregate_sales_by_day(sales_data, start_date, end_date, product_codes)
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    if len(product_codes):
+        series, labels = matrix, [f'Product {code}' for code in product_codes]
+        if max_series is not None and len(product_codes) > max_series:
+            # Plot the best sellers individually and fold the long tail into one series
+            order = np.argsort(matrix.sum(axis=1), kind='stable')[::-1]
+            series, labels = matrix[order[:max_series]], [f'Product {code}' for code in product_codes[order[:max_series]]]
+            series = np.vstack([series, matrix[order[max_series:]].sum(axis=0)])
+            labels.append(f'Other products ({len(order) - max_series})')
+
+        # Draw every series (line + dots) in a single call
+        lines = ax.plot(dates, series.T, linestyle='-', marker='o', markersize=3, markerfacecolor='#0ADD08', markeredgecolor='#0ADD08')
+
+        rows, cols = np.nonzero(series)
+        if max_annotations is not None and len(rows) > max_annotations:
+            # Annotate only the largest non-zero points so long ranges stay readable
+            top = np.argsort(series[rows, cols], kind='stable')[-max_annotations:]
+            rows, cols = rows[top], cols[top]
+        for row, col in zip(rows, cols):
+            ax.annotate(int(series[row, col]), (dates[col], series[row, col]), textcoords="offset points", xytext=(0, 10), ha='center')
+        # A fixed location avoids the costly 'best' placement search over every point
+        ax.legend(lines, labels, loc='upper left', fontsize='small')
+
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Quantity Sold')
+    ax.set_title('Product Sales Over Time')
+    ax.grid(True)
+    plt.xticks(rotation=45)
+
+    # Save the line chart visualization as bytes in memory
+    buf_line_chart = io.BytesIO()
+    fig.savefig(buf_line_chart, format='png')  # fig.savefig, unlike plt.savefig, draws the figure only once
+    plt.close(fig)  # Close the figure to free memory
+    buf_line_chart.seek(0)
+
+    return buf_line_chart
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import StockXUser, StoreUser, Brand, Category, SizeRange, Color, Store, Product, Stock, StockTransaction, SalesTransaction
+from .models import StockXUser, StoreUser, Brand, Category, SizeRange, Color, Store, Product, Stock, StockTransaction, SalesTransaction, DailyProductRollup
 
 
 @admin.register(StockXUser)
@@ -94,4 +94,12 @@ class StoreAdmin(admin.ModelAdmin):
     list_display = ['name', 'owner', 'location', 'created_at', 'updated_at']
     search_fields = ['name', 'owner', 'location']
     list_per_page = 15
-    ordering = ['-updated_at']
\ No newline at end of file
+    ordering = ['-updated_at']
+
+@admin.register(DailyProductRollup)
+class DailyProductRollupAdmin(admin.ModelAdmin):
+    list_display = ['product', 'date', 'units_in', 'units_out', 'units_sold', 'revenue', 'cost']
+    search_fields = ['product__name', 'product__code']
+    list_filter = ['date', 'store']
+    list_per_page = 15
+    ordering = ['-date']
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from rest_framework.authentication import BaseAuthentication
+
+from .models import StockXUser, Store, StoreUser
+from .sharding import activate_store
+
+DEFAULT_USER = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
+
+TelegramIdentity = namedtuple('TelegramIdentity', ['tg_id', 'user', 'store'])
+
+# tg_id -> (expiry, TelegramIdentity), shared by every request of the process
+_identities = {}
+_lock = threading.Lock()
+# Bumped on every invalidation so a lookup racing with a Store/StoreUser write is not cached
+_generation = 0
+
+
+def resolve_identity(tg_id):
+    """Return the TelegramIdentity (StockXUser and Store, either may be None) of `tg_id`."""
+    now = time.monotonic()
+    cached = _identities.get(tg_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    generation = _generation
+    user = StockXUser.objects.filter(tg_id=tg_id).first()
+    store = None
+    if user is not None:
+        # The user's own store, else the store they are a verified member of
+        store = Store.objects.filter(owner=user).first() or Store.objects.filter(storeuser__user=user, storeuser__verified=True).first()
+    identity = TelegramIdentity(tg_id, user, store)
+
+    ttl = getattr(settings, 'STORE_IDENTITY_CACHE_TTL', 300)
+    with _lock:
+        if generation == _generation:
+            _identities[tg_id] = (now + ttl, identity)
+    return identity
+
+
+def clear_identity_cache(**kwargs):
+    """Forget every cached identity; connected to Store, StoreUser and StockXUser changes."""
+    global _generation
+    with _lock:
+        _generation += 1
+        _identities.clear()
+
+
+for model in (StockXUser, Store, StoreUser):
+    post_save.connect(clear_identity_cache, sender=model, dispatch_uid=f'clear_identity_cache_{model.__name__}_save')
+    post_delete.connect(clear_identity_cache, sender=model, dispatch_uid=f'clear_identity_cache_{model.__name__}_delete')
+
+
+class TelegramUserAuthentication(BaseAuthentication):
+    """
+    Identify the Telegram user from the request body's `user` (the default user
+    when absent), as the views always have, and expose their store as
+    `request.store` so views filter on a plain store_id.
+
+    Resolution is cached per process, so a request costs no queries once its
+    user has been seen and nothing about stores and memberships has changed.
+    """
+
+    def authenticate(self, request):
+        user = request.data.get('user', DEFAULT_USER)
+        if not isinstance(user, dict) or not user.get('tg_id'):
+            user = DEFAULT_USER
+        identity = resolve_identity(str(user['tg_id']))
+        # Set on the underlying HttpRequest, like DRF does for request.user, so middleware sees it too
+        request._request.store = identity.store
+        # Send the request's operational queries to the store's shard (a no-op unless sharded)
+        activate_store(identity.store)
+        if identity.user is None:
+            return None
+        return identity.user, identity
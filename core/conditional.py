@@ -0,0 +1,80 @@
+import hashlib
+
+from django.db.models import Count, Max, Sum
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Product
+
+
+class ConditionalListMixin:
+    """
+    ETag / Last-Modified support for list views.
+
+    The validators come from one aggregate over the view's queryset (the latest
+    of `validator_fields` plus the row count) and the latest `updated_at` of the
+    small `validator_models` tables the serializer nests. With keyset
+    pagination the aggregate only covers the page served, so a page costs the
+    same however long the history behind it. A client sending them
+    back with If-None-Match gets an empty 304 while nothing it would receive
+    has changed. Last-Modified is sent for information only: a deleted row
+    leaves it unchanged, so If-Modified-Since alone never answers 304.
+    """
+    validator_fields = ('updated_at',)
+    validator_models = ()
+
+    def get_validators(self):
+        """Return the (etag, last_modified) pair of the current response."""
+        queryset = self.filter_queryset(self.get_queryset())
+        aggregates = {f'latest_{index}': Max(field) for index, field in enumerate(self.validator_fields)}
+        if hasattr(self.paginator, 'get_page_queryset'):
+            # A keyset page is the rows after its cursor (part of the query string below), named by
+            # their count and the sum of their ids
+            queryset = self.paginator.get_page_queryset(queryset, self.request)
+            aggregates['ids'] = Sum('pk')
+        else:
+            queryset = queryset.order_by()
+        values = queryset.aggregate(count=Count('pk'), **aggregates)
+        timestamps = [value for key, value in values.items() if key.startswith('latest_') and value]
+        for model in self.validator_models:
+            latest = model.objects.aggregate(latest=Max('updated_at'))['latest']
+            values[model.__name__] = latest
+            if latest:
+                timestamps.append(latest)
+
+        # Query parameters (filters, cursor) and the response format change the body too
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        key = repr((sorted(values.items()), self.request.get_full_path(), getattr(renderer, 'format', None)))
+        etag = f'"{hashlib.md5(key.encode()).hexdigest()}"'
+        last_modified = int(max(timestamps).timestamp()) if timestamps else None
+        return etag, last_modified
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        # Only the ETag, which counts the rows, notices deletions
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+def touch_products(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """m2m_changed receiver bumping the updated_at of products whose colors changed."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        product_ids = [instance.pk]
+    elif pk_set is not None:
+        product_ids = pk_set
+    else:
+        # A color's products being cleared, read them before the links go
+        product_ids = list(sender.objects.using(using).filter(color_id=instance.pk).values_list('product_id', flat=True))
+    Product.objects.using(using).filter(pk__in=product_ids).update(updated_at=timezone.now())
+
+
+m2m_changed.connect(touch_products, sender=Product.colors.through, dispatch_uid='touch_products_colors')
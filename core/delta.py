@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+
+class DeltaSyncMixin:
+    """
+    `?since=<ISO timestamp>` delta mode for list views.
+
+    Instead of the full list the response is
+    `{"since": <watermark>, "results": [...], "deleted": [ids]}` with only the
+    rows whose `delta_fields` advanced since the given timestamp; rows that have
+    been deactivated (`tombstone_field` false) are reported by id in `deleted`.
+    Clients pass the returned watermark as the next `since`. The lookup reaches
+    back `delta_overlap` before `since` so that rows saved by transactions still
+    in flight while the watermark was taken are not missed; replaying them is
+    harmless since clients upsert by id.
+    """
+    delta_fields = ('updated_at',)
+    tombstone_field = 'is_active'
+    since_query_param = 'since'
+    delta_overlap = timedelta(seconds=5)
+
+    def get_since(self):
+        value = self.request.query_params.get(self.since_query_param)
+        if not value:
+            return None
+        try:
+            since = parse_datetime(value)
+        except ValueError:
+            since = None
+        if since is None:
+            raise ParseError(f"Invalid {self.since_query_param} '{value}', expected an ISO 8601 timestamp")
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def list(self, request, *args, **kwargs):
+        since = self.get_since()
+        if since is None:
+            return super().list(request, *args, **kwargs)
+
+        # Taken before querying, so anything saved from now on is in the next delta
+        watermark = timezone.now()
+        changed = Q()
+        for field in self.delta_fields:
+            changed |= Q(**{f'{field}__gte': since - self.delta_overlap})
+        queryset = self.filter_queryset(self.get_queryset()).filter(changed)
+        active = Q(**{self.tombstone_field: True})
+
+        serializer = self.get_serializer(queryset.filter(active), many=True)
+        deleted = list(queryset.exclude(active).order_by().values_list('pk', flat=True))
+        return Response({'since': watermark, 'results': serializer.data, 'deleted': deleted})
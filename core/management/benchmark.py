@@ -0,0 +1,41 @@
+import time
+
+from core.models import Brand, Category, Color, Product, SalesTransaction, SizeRange, Stock, StockTransaction, StockXUser, Store
+
+
+def seed_store(products, sales):
+    """Create a store with `products` stocked products and `sales` stock and sales transactions, for benchmarks."""
+    owner = StockXUser.objects.create(tg_id='benchmark')
+    store = Store.objects.create(owner=owner, name='Benchmark', location='-')
+    categories = [Category.objects.create(name=f'Category {i}') for i in range(10)]
+    brands = [Brand.objects.create(name=f'Brand {i}') for i in range(10)]
+    size_range = SizeRange.objects.create(name='EU', size_value='40')
+    colors = [Color.objects.create(name=f'Color {i}', color_code='#000') for i in range(8)]
+    rows = Product.objects.bulk_create([
+        Product(store=store, name=f'Product {i}', code=f'BENCH{i}', description='Benchmark product', category=categories[i % 10],
+                brand=brands[i % 10], size_range=size_range, initial_quantity=100, cost_price='5.00', selling_price='8.00')
+        for i in range(products)
+    ])
+    Product.colors.through.objects.bulk_create([
+        Product.colors.through(product=product, color=colors[(i + offset) % 8]) for i, product in enumerate(rows) for offset in range(2)
+    ])
+    Stock.objects.bulk_create([Stock(store=store, product=product, stock_on_hand=100) for product in rows])
+    StockTransaction.objects.bulk_create([
+        StockTransaction(store=store, product=rows[i % products], quantity=1, stock_type='1', modified_by='benchmark') for i in range(sales)
+    ])
+    SalesTransaction.objects.bulk_create([
+        SalesTransaction(store=store, product=rows[i % products], quantity_sold=1, unit_price='8.00', total_amount='8.00', sold_by='benchmark')
+        for i in range(sales)
+    ])
+    return store
+
+
+def best_of(function, repeat):
+    """The shortest of `repeat` timed calls of `function`, in seconds."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
@@ -0,0 +1,55 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDate
+
+from core.models import DailyProductRollup, SalesTransaction, StockTransaction
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily product rollups from the stock and sales transaction history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', type=int, help="Only rebuild the rollups of this store id")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        scope = {'store_id': options['store']} if options['store'] else {}
+        rollups = defaultdict(lambda: {'units_in': 0, 'units_out': 0, 'units_sold': 0, 'revenue': Decimal('0'), 'cost': Decimal('0')})
+
+        stock_totals = StockTransaction.objects.filter(**scope).annotate(date=TruncDate('created_at')).values(
+            'store_id', 'product_id', 'date'
+        ).annotate(
+            units_in=Sum('quantity', filter=Q(stock_type='1')),
+            units_out=Sum('quantity', filter=Q(stock_type='2')),
+        ).order_by()
+        for row in stock_totals:
+            rollup = rollups[(row['store_id'], row['product_id'], row['date'])]
+            rollup['units_in'] = row['units_in'] or 0
+            rollup['units_out'] = -(row['units_out'] or 0)
+
+        sales_totals = SalesTransaction.objects.filter(**scope).annotate(date=TruncDate('created_at')).values(
+            'store_id', 'product_id', 'date'
+        ).annotate(
+            units_sold=Sum('quantity_sold'),
+            revenue=Sum('total_amount'),
+            cost=Sum(F('quantity_sold') * F('product__cost_price')),
+        ).order_by()
+        for row in sales_totals:
+            rollup = rollups[(row['store_id'], row['product_id'], row['date'])]
+            rollup['units_sold'] = row['units_sold'] or 0
+            rollup['revenue'] = row['revenue'] or 0
+            rollup['cost'] = row['cost'] or 0
+
+        with transaction.atomic():
+            DailyProductRollup.objects.filter(**scope).delete()
+            DailyProductRollup.objects.bulk_create(
+                (DailyProductRollup(store_id=store_id, product_id=product_id, date=date, **values)
+                 for (store_id, product_id, date), values in rollups.items()),
+                batch_size=options['batch_size'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(rollups)} daily product rollups"))
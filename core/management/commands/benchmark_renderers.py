@@ -0,0 +1,60 @@
+import io
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import compress_string
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.management.benchmark import best_of, seed_store
+from core.middleware import brotli
+from core.models import SalesTransaction, Stock
+from core.parsers import ORJSONParser
+from core.readers import ValuesSerializer
+from core.renderers import ORJSONRenderer
+from core.serializers import SalesTransactionListSerializer, StockDetailSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Time rendering (JSONRenderer against ORJSONRenderer), parsing and compressing (gzip, and "
+        "brotli when installed) the /stocks/ and /sales-transactions/ bodies, on rows seeded in a "
+        "transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Stocks and sales seeded")
+        parser.add_argument('--repeat', type=int, default=3, help="Best of this many runs")
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        with transaction.atomic():
+            store = seed_store(options['rows'], options['rows'])
+            bodies = [
+                ('/stocks/', ValuesSerializer(Stock.objects.for_store(store), StockDetailSerializer).data),
+                ('/sales-transactions/', ValuesSerializer(SalesTransaction.objects.for_store(store), SalesTransactionListSerializer).data),
+            ]
+            transaction.set_rollback(True)
+
+        for path, data in bodies:
+            body = ORJSONRenderer().render(data)
+            if body != JSONRenderer().render(data):
+                raise CommandError(f"ORJSONRenderer and JSONRenderer disagree on {path}")
+            self.stdout.write(f"{path} ({len(data)} rows, {len(body) / 1024:.0f} KiB)")
+            self.report('render', 'JSONRenderer', best_of(lambda: JSONRenderer().render(data), repeat),
+                        'ORJSONRenderer', best_of(lambda: ORJSONRenderer().render(data), repeat))
+            self.report('parse', 'JSONParser', best_of(lambda: JSONParser().parse(io.BytesIO(body)), repeat),
+                        'ORJSONParser', best_of(lambda: ORJSONParser().parse(io.BytesIO(body)), repeat))
+            gzipped = compress_string(body)
+            self.stdout.write(f"  {'gzip':>8}: {len(gzipped) / 1024:8.0f} KiB in {best_of(lambda: compress_string(body), repeat) * 1000:7.1f} ms")
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=settings.BROTLI_QUALITY)
+                seconds = best_of(lambda: brotli.compress(body, quality=settings.BROTLI_QUALITY), repeat)
+                self.stdout.write(f"  {'br':>8}: {len(compressed) / 1024:8.0f} KiB in {seconds * 1000:7.1f} ms")
+
+    def report(self, step, baseline, baseline_seconds, fast, fast_seconds):
+        self.stdout.write(
+            f"  {step:>8}: {baseline} {baseline_seconds * 1000:7.1f} ms  {fast} {fast_seconds * 1000:7.1f} ms  "
+            f"({baseline_seconds / fast_seconds:.1f}x)"
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.management.benchmark import best_of, seed_store
+from core.models import Product, SalesTransaction, Stock, StockTransaction
+from core.readers import ValuesSerializer
+from core.serializers import ProductListSerializer, SalesTransactionListSerializer, StockDetailSerializer, StockTransactionListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure rows/s of the list endpoints' ModelSerializer path against ValuesSerializer, on "
+        "rows seeded in a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--sales', type=int, default=10000, help="Sales (and stock) transactions seeded")
+        parser.add_argument('--repeat', type=int, default=3, help="Best of this many runs")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            store = seed_store(options['products'], options['sales'])
+            cases = [
+                ('products', Product.objects.for_store(store).select_related('category', 'brand').prefetch_related('colors'), ProductListSerializer),
+                ('stocks', Stock.objects.for_store(store).select_related('product__category', 'product__brand').prefetch_related('product__colors'), StockDetailSerializer),
+                ('stock-transactions', StockTransaction.objects.for_store(store).select_related('product__category', 'product__brand').prefetch_related('product__colors'), StockTransactionListSerializer),
+                ('sales-transactions', SalesTransaction.objects.for_store(store).select_related('product__category', 'product__brand').prefetch_related('product__colors'), SalesTransactionListSerializer),
+            ]
+            for name, queryset, serializer_class in cases:
+                rows = queryset.count()
+                model = best_of(lambda: serializer_class(queryset.all(), many=True).data, options['repeat'])
+                values = best_of(lambda: ValuesSerializer(queryset.all(), serializer_class).data, options['repeat'])
+                self.stdout.write(
+                    f"{name:>18}: {rows:6} rows  ModelSerializer {rows / model:9.0f} rows/s  "
+                    f"ValuesSerializer {rows / values:9.0f} rows/s  ({model / values:.1f}x)"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import apply_pragmas
+
+SCHEMA = """
+CREATE TABLE stock (id INTEGER PRIMARY KEY, store_id INTEGER NOT NULL, stock_on_hand INTEGER NOT NULL);
+CREATE TABLE sale (id INTEGER PRIMARY KEY, store_id INTEGER NOT NULL, stock_id INTEGER NOT NULL, quantity INTEGER NOT NULL, created_at REAL NOT NULL);
+CREATE INDEX sale_store_created ON sale (store_id, created_at);
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent read/write throughput of a scratch SQLite database with the default "
+        "connection setup (a new connection per operation, rollback journal) and with the "
+        "production profile (persistent connections, SQLITE_PRAGMAS, immediate transactions)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run")
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--rows', type=int, default=20000, help="Sales rows seeded before each run")
+
+    def handle(self, *args, **options):
+        for profile in ('default', 'production'):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                self.seed(path, options['rows'])
+                reads, writes, locked = self.run(path, profile, options)
+            seconds = options['seconds']
+            self.stdout.write(
+                f"{profile:>10}: {reads / seconds:8.0f} reads/s  {writes / seconds:8.0f} writes/s  "
+                f"{locked} 'database is locked' errors"
+            )
+
+    def seed(self, path, rows):
+        connection = sqlite3.connect(path)
+        connection.executescript(SCHEMA)
+        connection.executemany('INSERT INTO stock (id, store_id, stock_on_hand) VALUES (?, ?, ?)', [(i, i % 10, 10 ** 9) for i in range(1, 1001)])
+        now = time.time()
+        connection.executemany(
+            'INSERT INTO sale (store_id, stock_id, quantity, created_at) VALUES (?, ?, 1, ?)',
+            [(i % 10, i % 1000 + 1, now - i) for i in range(rows)],
+        )
+        connection.commit()
+        connection.close()
+
+    def connect(self, path, profile):
+        if profile == 'default':
+            # Python's sqlite3 defaults, as Django uses them without OPTIONS or pragmas
+            return sqlite3.connect(path, check_same_thread=False)
+        timeout = settings.DATABASES['default'].get('OPTIONS', {}).get('timeout', 5)
+        connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        apply_pragmas(connection.cursor(), settings.SQLITE_PRAGMAS)
+        return connection
+
+    def run(self, path, profile, options):
+        stop = time.monotonic() + options['seconds']
+        counts = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        persistent = profile != 'default'
+
+        def work(operation):
+            connection = self.connect(path, profile) if persistent else None
+            done = locked = 0
+            while time.monotonic() < stop:
+                current = connection or self.connect(path, profile)
+                try:
+                    operation(current)
+                    done += 1
+                except sqlite3.OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    locked += 1
+                    if current.in_transaction:
+                        current.rollback()
+                finally:
+                    if not persistent:
+                        current.close()
+            if connection is not None:
+                connection.close()
+            with lock:
+                counts[operation.__name__] += done
+                counts['locked'] += locked
+
+        def reads(connection):
+            store_id = threading.get_ident() % 10
+            connection.execute(
+                'SELECT COUNT(*), SUM(quantity) FROM sale WHERE store_id = ? AND created_at >= ?',
+                (store_id, time.time() - 3600),
+            ).fetchone()
+
+        def writes(connection):
+            # A sale: decrement the stock and record the transaction atomically
+            stock_id = threading.get_ident() % 1000 + 1
+            connection.execute('BEGIN IMMEDIATE' if persistent else 'BEGIN')
+            connection.execute('UPDATE stock SET stock_on_hand = stock_on_hand - 1 WHERE id = ? AND stock_on_hand >= 1', (stock_id,))
+            connection.execute('INSERT INTO sale (store_id, stock_id, quantity, created_at) VALUES (?, ?, 1, ?)', (stock_id % 10, stock_id, time.time()))
+            connection.execute('COMMIT')
+
+        threads = [threading.Thread(target=work, args=(reads,)) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=work, args=(writes,)) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts['reads'], counts['writes'], counts['locked']
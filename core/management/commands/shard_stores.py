@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from core.models import Product, Store
+from core.sharding import copy_rows, copy_mirrored_rows, provision_shard, store_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Move each store's products, stock, transactions and rollups into its STORE_SHARDING shard, "
+        "creating and migrating the shard first, and refresh the shards' copy of the central tables. "
+        "Until a store has been moved, its rows are served from the central database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', type=int, help="Only this store id")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not settings.STORE_SHARDING:
+            raise CommandError("Sharding is disabled, set STORE_SHARDING=1")
+        stores = Store.objects.using(DEFAULT_DB_ALIAS).order_by('pk')
+        if options['store']:
+            stores = stores.filter(pk=options['store'])
+
+        for store in stores:
+            alias = provision_shard(store.pk)
+            copy_mirrored_rows(alias)
+            moved = self.move_rows(store, alias, options['batch_size'])
+            self.stdout.write(f"{store.name}: {alias} ready, {moved} rows moved")
+
+    def move_rows(self, store, alias, batch_size):
+        # Whatever is still central: every row on a store's first run (provision_shard copied
+        # them already), then the writes made while the shard was being built
+        moved = 0
+        with transaction.atomic(using=alias), transaction.atomic(using=DEFAULT_DB_ALIAS):
+            for model, rows in store_rows(store.pk):
+                for start in range(0, rows.count(), batch_size):
+                    batch = list(rows[start:start + batch_size])
+                    copy_rows(model, batch, alias)
+                    moved += len(batch)
+            # Cascades to the store's stock, transactions, rollups and product colors
+            Product.objects.using(DEFAULT_DB_ALIAS).filter(store=store).delete()
+        return moved
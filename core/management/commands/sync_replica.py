@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.routers import replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the SQLite read replica (DB_REPLICA_PATH) with "
+        "SQLite's online backup API, once or every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="Keep copying, this many seconds apart")
+        parser.add_argument('--pages', type=int, default=1024, help="Pages copied per step, releasing the locks in between")
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No replica database is configured, set DB_REPLICA_PATH")
+        primary, replica = settings.DATABASES['default'], settings.DATABASES[alias]
+        if 'sqlite3' not in primary['ENGINE'] or 'sqlite3' not in replica['ENGINE']:
+            raise CommandError("sync_replica copies SQLite files; a PostgreSQL replica is kept in sync by replication")
+
+        while True:
+            started = time.monotonic()
+            self.copy(str(primary['NAME']), str(replica['NAME']), options['pages'])
+            self.stdout.write(f"Copied {primary['NAME']} to {replica['NAME']} in {time.monotonic() - started:.2f}s")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source_path, replica_path, pages):
+        # A consistent snapshot of the primary (restarted if it is written meanwhile); readers
+        # of the replica wait for the copy under their busy timeout
+        source = sqlite3.connect(source_path)
+        replica = sqlite3.connect(replica_path, timeout=30)
+        try:
+            source.backup(replica, pages=pages)
+        finally:
+            replica.close()
+            source.close()
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the test suite against a throwaway local PostgreSQL server, without Docker. "
+        "The server comes from the pgserver package (pip install pgserver), which bundles "
+        "the PostgreSQL binaries; extra arguments are passed on to `manage.py test`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_labels', nargs='*')
+
+    def handle(self, *args, **options):
+        try:
+            import pgserver
+        except ImportError:
+            raise CommandError("pgserver is not installed: pip install pgserver 'psycopg[binary,pool]'")
+
+        with tempfile.TemporaryDirectory() as directory:
+            server = pgserver.get_server(directory, cleanup_mode='stop')
+            self.stdout.write(f"PostgreSQL running at {server.get_uri()}")
+            # Settings are read at start up, so the suite runs in a fresh process pointed at the server
+            environment = {**os.environ, 'DATABASE_URL': server.get_uri()}
+            command = [sys.executable, sys.argv[0], 'test', *options['test_labels']]
+            returncode = subprocess.call(command, env=environment)
+            server.cleanup()
+        if returncode:
+            raise CommandError(f"Tests failed against PostgreSQL (exit status {returncode})")
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from .routers import pin_to_primary, replica_alias
+from .sharding import activate_store, deactivate_store
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+
+class PrimaryPinningMiddleware:
+    """
+    After a successful write, pin the writing store to the primary database
+    for REPLICA_STICKY_SECONDS, so that its next reads (a report right after a
+    sale) don't miss what it just wrote while the replica lags. The pin is
+    kept in the cache per store rather than in a cookie, as the bot sends
+    every Telegram user's requests through one HTTP client.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        store = getattr(request, 'store', None)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400 and store is not None and replica_alias():
+            pin_to_primary(store)
+        return response
+
+
+class StoreShardMiddleware:
+    """
+    Scope the store shard selected by TelegramUserAuthentication to its
+    request, so the next request served by the same thread starts from the
+    central database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = activate_store(None)
+        try:
+            return self.get_response(request)
+        finally:
+            deactivate_store(token)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress responses of COMPRESSION_MIN_SIZE bytes or more: with brotli when
+    the client accepts `br` and the brotli package is installed, otherwise
+    with gzip by GZipMiddleware (which also compresses the streamed exports).
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is None or response.streaming or response.has_header('Content-Encoding') or not re_accepts_brotli.search(accepted):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=settings.BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # A strong ETag names the uncompressed bytes, see GZipMiddleware
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
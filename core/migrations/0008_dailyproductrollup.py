@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_rename_upated_at_stockxuser_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyProductRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField()),
+                ("units_in", models.IntegerField(default=0)),
+                ("units_out", models.IntegerField(default=0)),
+                ("units_sold", models.IntegerField(default=0)),
+                ("revenue", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("cost", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("product", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="daily_rollups", to="core.product")),
+                ("store", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="core.store")),
+            ],
+            options={
+                "constraints": [models.UniqueConstraint(fields=("store", "product", "date"), name="unique_daily_product_rollup")],
+            },
+        ),
+    ]
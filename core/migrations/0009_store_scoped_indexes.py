@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_dailyproductrollup"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="salestransaction",
+            index=models.Index(fields=["store", "created_at"], name="salestx_store_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(fields=["store", "created_at"], name="stocktx_store_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(fields=["store", "stock_type"], name="stocktx_store_type_idx"),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_store_scoped_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="dailyproductrollup",
+            index=models.Index(fields=["store", "date"], name="rollup_store_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["store", "category"], name="product_store_category_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["store", "brand"], name="product_store_brand_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["store", "updated_at"], name="product_store_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="salestransaction",
+            index=models.Index(fields=["product", "created_at"], name="salestx_product_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="salestransaction",
+            index=models.Index(fields=["created_at"], name="salestx_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(fields=["store", "updated_at"], name="stock_store_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(fields=["product", "created_at"], name="stocktx_product_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(fields=["stock_date"], name="stocktx_stock_date_idx"),
+        ),
+    ]
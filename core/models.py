@@ -1,5 +1,6 @@
-from django.db import models
-from django.db.models import Sum
+from django.db import models, router, transaction, IntegrityError
+from django.db.models import Sum, F, Q, Case, When
+from django.utils import timezone
 from django.core.validators import RegexValidator
 from django.utils.crypto import get_random_string
 
@@ -19,6 +20,10 @@ class StockXUser(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # Lets DRF treat a resolved Telegram user (request.user) like an authenticated Django user
+    is_authenticated = True
+    is_anonymous = False
     
     def __str__(self):
         return f'{self.first_name} {self.last_name} ({self.tg_id})'
@@ -80,6 +85,14 @@ class StoreUser(models.Model):
         # Generate a 6-digit random verification code
         return get_random_string(length=6, allowed_chars='1234567890')
 
+
+class StoreScopedQuerySet(models.QuerySet):
+    """Queryset of a model carrying its own `store` foreign key."""
+
+    def for_store(self, store):
+        """Rows belonging to `store`, filtered on the model's store_id without joining other tables."""
+        return self.filter(store=store)
+
     
 class Product(models.Model):
     store = models.ForeignKey(Store, on_delete=models.CASCADE)  # Associate product with a store
@@ -102,6 +115,16 @@ class Product(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    objects = StoreScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Products by category/brand and ?since= delta syncs of a store
+            models.Index(fields=['store', 'category'], name='product_store_category_idx'),
+            models.Index(fields=['store', 'brand'], name='product_store_brand_idx'),
+            models.Index(fields=['store', 'updated_at'], name='product_store_updated_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.code} - {self.brand} - {self.size_range}"
 
@@ -117,6 +140,13 @@ class Stock(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = StoreScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', 'updated_at'], name='stock_store_updated_idx'),
+        ]
+
     def __str__(self):
         return f"{self.product} - Stock on Hand: {self.stock_on_hand}"
 
@@ -127,6 +157,34 @@ class Stock(models.Model):
         self.stock_on_hand += quantity
         self.save()
 
+    @classmethod
+    def decrement_stock_on_hand(cls, store, product, quantity):
+        """
+        Take `quantity` off the stock on hand in a single conditional UPDATE, so concurrent
+        sales can never oversell. Returns False, changing nothing, if there isn't enough stock.
+        """
+        return cls.objects.for_store(store).filter(product=product, stock_on_hand__gte=quantity).update(
+            stock_on_hand=F('stock_on_hand') - quantity,
+            updated_at=timezone.now(),
+        ) == 1
+
+    @classmethod
+    def decrement_stocks_on_hand(cls, store, quantities):
+        """
+        Take several products' quantities ({product_id: quantity}) off their stock in one
+        conditional UPDATE. Returns False if any of them didn't have enough stock; the caller
+        must then roll back its transaction, as the other rows will have been decremented.
+        """
+        enough_stock = Q()
+        for product_id, quantity in quantities.items():
+            enough_stock |= Q(product_id=product_id, stock_on_hand__gte=quantity)
+        decrement = Case(
+            *[When(product_id=product_id, then=F('stock_on_hand') - quantity) for product_id, quantity in quantities.items()],
+            output_field=models.PositiveIntegerField(),
+        )
+        updated = cls.objects.for_store(store).filter(enough_stock).update(stock_on_hand=decrement, updated_at=timezone.now())
+        return updated == len(quantities)
+
 class StockTransaction(models.Model):
     STOCK_TYPES = (('1', 'In 🟢'), ('2', 'Out🔺'))
     store = models.ForeignKey(Store, on_delete=models.CASCADE)  # Associate stock transaction with a store
@@ -137,6 +195,18 @@ class StockTransaction(models.Model):
     stock_date = models.DateTimeField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = StoreScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Store scoped, date ordered lists and reports, and stock in/out totals
+            models.Index(fields=['store', 'created_at'], name='stocktx_store_created_idx'),
+            models.Index(fields=['store', 'stock_type'], name='stocktx_store_type_idx'),
+            # A product's history (exports, rollup backfill) and the admin's newest first list
+            models.Index(fields=['product', 'created_at'], name='stocktx_product_created_idx'),
+            models.Index(fields=['stock_date'], name='stocktx_stock_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.product} - {self.quantity} - {self.get_stock_type_display()}"
 
@@ -150,6 +220,15 @@ class SalesTransaction(models.Model):
     sold_by = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = StoreScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', 'created_at'], name='salestx_store_created_idx'),
+            models.Index(fields=['product', 'created_at'], name='salestx_product_created_idx'),
+            models.Index(fields=['created_at'], name='salestx_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.product} - {self.quantity_sold} - {self.total_amount}"
     
@@ -159,3 +238,54 @@ class SalesTransaction(models.Model):
             self.unit_price = self.product.selling_price
         self.total_amount = self.quantity_sold * self.unit_price
         super().save(*args, **kwargs)
+
+
+class DailyProductRollup(models.Model):
+    """Per store, per product, per day totals kept in step with every stock and sale write."""
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    units_in = models.IntegerField(default=0)
+    units_out = models.IntegerField(default=0)
+    units_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    objects = StoreScopedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'product', 'date'], name='unique_daily_product_rollup'),
+        ]
+        indexes = [
+            # Report date ranges across all of a store's products
+            models.Index(fields=['store', 'date'], name='rollup_store_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} - {self.date} - Sold: {self.units_sold}"
+
+    @classmethod
+    def record(cls, store, product, date=None, units_in=0, units_out=0, units_sold=0, revenue=0, cost=0):
+        """
+        Add the given amounts to the store/product/day row, creating it if needed.
+        Call it inside the transaction that writes the underlying stock or sale rows.
+        """
+        date = date or timezone.localdate()
+        increments = {
+            'units_in': F('units_in') + units_in,
+            'units_out': F('units_out') + units_out,
+            'units_sold': F('units_sold') + units_sold,
+            'revenue': F('revenue') + revenue,
+            'cost': F('cost') + cost,
+        }
+        rows = cls.objects.for_store(store).filter(product=product, date=date)
+        if rows.update(**increments):
+            return
+        try:
+            # Savepoint so a concurrent insert of the same row doesn't break the outer transaction
+            with transaction.atomic(using=router.db_for_write(cls)):
+                cls.objects.create(store=store, product=product, date=date, units_in=units_in, units_out=units_out,
+                                   units_sold=units_sold, revenue=revenue, cost=cost)
+        except IntegrityError:
+            rows.update(**increments)
@@ -0,0 +1,57 @@
+from .readers import ValuesSerializer
+from .renderers import NormalizedJSONRenderer
+
+
+class NormalizedListMixin:
+    """
+    `?format=normalized` response mode for list views whose rows embed the
+    same related objects over and over (a product per transaction).
+
+    Rows are rendered with the flat `normalized_serializer_class` (related
+    objects as ids) and the related objects are side-loaded once per response
+    under `included`, keyed by id:
+    `{"next": ..., "results": [...], "included": {"products": {...}, ...}}`.
+
+    `included` lists (name, field, origin, serializer class) entries: the
+    objects whose ids are in `field` of the rows (origin None) or of an
+    earlier entry's objects (origin its name), in order.
+    """
+    normalized_serializer_class = None
+    included = ()
+
+    def get_renderers(self):
+        return super().get_renderers() + [NormalizedJSONRenderer()]
+
+    def is_normalized(self):
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        return getattr(renderer, 'format', None) == NormalizedJSONRenderer.format
+
+    def get_serializer_class(self):
+        if self.is_normalized():
+            return self.normalized_serializer_class
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if not self.is_normalized() or response.status_code != 200:
+            return response
+        if not isinstance(response.data, dict):
+            response.data = {'results': response.data}
+        response.data['included'] = self.get_included(response.data['results'])
+        return response
+
+    def get_included(self, rows):
+        included = {}
+        for name, field, origin, serializer_class in self.included:
+            source = rows if origin is None else included[origin].values()
+            ids = set()
+            for row in source:
+                # Missing when a sparse fieldset left it out
+                value = row.get(field)
+                if isinstance(value, list):
+                    ids.update(value)
+                elif value is not None:
+                    ids.add(value)
+            queryset = serializer_class.Meta.model.objects.filter(pk__in=ids).order_by('pk')
+            included[name] = {row['id']: row for row in ValuesSerializer(queryset, serializer_class).data}
+        return included
@@ -0,0 +1,213 @@
+from functools import lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import QuerySet
+from rest_framework import serializers
+
+from .serializers import DynamicFieldsMixin, requested_fieldset
+
+# Fields whose to_representation returns the database value unchanged (str, int, bool, pk)
+PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.PrimaryKeyRelatedField)
+
+
+class ValuesPlan:
+    """
+    The `values()` columns a ModelSerializer renders and how to assemble its
+    output from them, worked out once per serializer class.
+
+    `mapping` holds one (kind, name, spec) entry per output field, in the
+    serializer's order:
+    - ('field', name, (column, convert)): a column, converted by the DRF
+      field's to_representation unless it returns database values unchanged
+    - ('nested', name, (column, mapping)): a nested serializer over a foreign
+      key, None when the key is null
+    - ('many', name, relation): a many-to-many field, read from its through
+      table by `relation` (a ManyRelation)
+    """
+
+    def __init__(self, serializer, prefix=''):
+        self.columns = []
+        self.relations = []
+        self.mapping = self.compile(serializer, prefix)
+
+    def compile(self, serializer, prefix):
+        mapping = []
+        model = serializer.Meta.model
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if '.' in field.source or field.source == '*':
+                raise ImproperlyConfigured(f"{type(serializer).__name__}.{name}: only model fields can be read with values()")
+            column = prefix + field.source
+            if isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)):
+                # Keyed by the id of the row owning the relation: the row itself or a nested foreign key
+                owner = prefix[:-2] if prefix else model._meta.pk.attname
+                self.add_column(owner)
+                child = field.child if isinstance(field, serializers.ListSerializer) else None
+                relation = ManyRelation(model._meta.get_field(field.source), owner, child)
+                self.relations.append(relation)
+                mapping.append(('many', name, relation))
+            elif isinstance(field, serializers.ModelSerializer):
+                self.add_column(column)
+                mapping.append(('nested', name, (column, self.compile(field, column + '__'))))
+            else:
+                self.add_column(column)
+                convert = None if isinstance(field, PLAIN_FIELDS) else field.to_representation
+                mapping.append(('field', name, (column, convert)))
+        return mapping
+
+    def add_column(self, column):
+        if column not in self.columns:
+            self.columns.append(column)
+
+    def values(self, queryset, extra=()):
+        """
+        The queryset of row dicts to render, with the `extra` columns too:
+        values() joins what it needs, ManyRelation reads the rest.
+        """
+        columns = self.columns + [column for column in extra if column not in self.columns]
+        return queryset.select_related(None).prefetch_related(None).values(*columns)
+
+
+class ManyRelation:
+    """Reads a many-to-many field of many owners with one query on its through table."""
+
+    def __init__(self, field, owner, child):
+        self.owner = owner
+        self.through = field.remote_field.through
+        self.source = field.m2m_field_name() + '_id'
+        self.target = field.m2m_reverse_field_name()
+        # A nested serializer renders the related rows, otherwise (PrimaryKeyRelatedField) their ids
+        self.plan = ValuesPlan(child, self.target + '__') if child is not None else None
+        if self.plan is not None and self.plan.relations:
+            raise ImproperlyConfigured(f"{type(child).__name__}: nested many-to-many fields can't be read with values()")
+        self.columns = [self.source, self.target + '_id'] + (self.plan.columns if self.plan else [])
+
+    def fetch(self, owner_ids, using):
+        """Return {owner id: [rendered related rows or ids]}, in related id order."""
+        related = {}
+        if not owner_ids:
+            return related
+        links = self.through.objects.using(using).filter(**{f'{self.source}__in': owner_ids})
+        for link in links.order_by(self.source, self.target + '_id').values(*self.columns):
+            value = render(link, self.plan.mapping, {}) if self.plan else link[self.target + '_id']
+            related.setdefault(link[self.source], []).append(value)
+        return related
+
+
+def render(row, mapping, related):
+    data = {}
+    for kind, name, spec in mapping:
+        if kind == 'field':
+            value = row[spec[0]]
+            data[name] = value if value is None or spec[1] is None else spec[1](value)
+        elif kind == 'nested':
+            data[name] = None if row[spec[0]] is None else render(row, spec[1], related)
+        else:
+            data[name] = related[spec].get(row[spec.owner], [])
+    return data
+
+
+@lru_cache(maxsize=256)
+def values_plan(serializer_class, fields=None, expand=None):
+    """The ValuesPlan of `serializer_class`, restricted to a sparse fieldset if it supports them."""
+    if issubclass(serializer_class, DynamicFieldsMixin):
+        return ValuesPlan(serializer_class(fields=fields, expand=expand))
+    return ValuesPlan(serializer_class())
+
+
+def loading_lookups(serializer, prefix=''):
+    """
+    The (only, select_related, prefetch_related) lookups loading just what
+    `serializer` renders, for its ModelSerializer path.
+    """
+    only, select, prefetch = [prefix + serializer.Meta.model._meta.pk.name], [], []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)):
+            prefetch.append(prefix + field.source)
+        elif isinstance(field, serializers.ModelSerializer):
+            select.append(prefix + field.source)
+            nested = loading_lookups(field, prefix + field.source + '__')
+            only += nested[0]
+            select += nested[1]
+            prefetch += nested[2]
+        else:
+            only.append(prefix + field.source)
+    return only, select, prefetch
+
+
+class ValuesSerializer:
+    """
+    Read-only stand-in for `serializer_class(instance, many=True)` on list
+    endpoints.
+
+    Rather than building a model instance per row and walking the serializer
+    fields of every row and every nested category, brand and color, it reads
+    the rendered columns as plain dicts with one `values()` query (plus one
+    per many-to-many field) and assembles the same JSON from the serializer's
+    ValuesPlan. `instance` is a queryset, or row dicts from `values()` read
+    from the `using` database (a page of them).
+    """
+
+    def __init__(self, instance, serializer_class, using=None, fields=None, expand=None):
+        self.instance = instance
+        self.plan = values_plan(serializer_class, fields, expand)
+        self.using = using
+
+    @property
+    def data(self):
+        rows, using = self.instance, self.using
+        if isinstance(rows, QuerySet):
+            rows, using = self.plan.values(rows), rows.db
+        rows = list(rows)
+        related = {relation: relation.fetch({row[relation.owner] for row in rows}, using) for relation in self.plan.relations}
+        return [render(row, self.plan.mapping, related) for row in rows]
+
+
+class ValuesListMixin:
+    """
+    Render a list view's GET responses with ValuesSerializer over its
+    serializer_class and the request's sparse fieldset, rows and pages
+    included (the paginator gets `values()` rows). Set
+    `values_serializer = False` to go back to the ModelSerializer.
+    """
+    values_serializer = True
+
+    def use_values_serializer(self):
+        return self.values_serializer and self.request.method in ('GET', 'HEAD')
+
+    def paginate_queryset(self, queryset):
+        if self.use_values_serializer():
+            self.values_db = queryset.db
+            plan = values_plan(self.get_serializer_class(), *requested_fieldset(self.request))
+            # The paginator orders and cuts pages on its position fields, rendered or not
+            queryset = plan.values(queryset, extra=getattr(self.paginator, 'position_fields', ()))
+        return super().paginate_queryset(queryset)
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and self.use_values_serializer():
+            return ValuesSerializer(args[0], self.get_serializer_class(), getattr(self, 'values_db', None), *requested_fieldset(self.request))
+        return super().get_serializer(*args, **kwargs)
+
+
+class SparseFieldsMixin:
+    """
+    Load only what a ?fields= / ?expand= request renders on the ModelSerializer
+    path (detail views, or lists without ValuesListMixin): only() the selected
+    columns and keep only the joins and prefetches still rendered.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, expand = requested_fieldset(self.request)
+        serializer_class = self.get_serializer_class()
+        if (fields is None and expand is None) or not issubclass(serializer_class, DynamicFieldsMixin):
+            return queryset
+        only, select, prefetch = loading_lookups(serializer_class(fields=fields, expand=expand))
+        # Keyset pages also read their position fields
+        only += getattr(self.paginator, 'position_fields', ())
+        # select_related() without arguments would follow every foreign key
+        queryset = queryset.select_related(None).select_related(*select) if select else queryset.select_related(None)
+        return queryset.prefetch_related(None).prefetch_related(*prefetch).only(*only)
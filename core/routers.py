@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Cache key prefix of the stores PrimaryPinningMiddleware has pinned to the primary
+PRIMARY_PIN_PREFIX = 'pin_primary:'
+
+# Set while a replica-safe view handles its request; records whether it has written since
+_replica_reads = ContextVar('replica_reads', default=None)
+
+
+def replica_alias():
+    """The replica's database alias, or None when no replica is configured."""
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', None)
+    return alias if alias in settings.DATABASES else None
+
+
+def pin_to_primary(store):
+    """Read `store`'s data from the primary for REPLICA_STICKY_SECONDS, after it was written."""
+    cache.set(f'{PRIMARY_PIN_PREFIX}{store.pk}', True, settings.REPLICA_STICKY_SECONDS)
+
+
+def pinned_to_primary(store):
+    return store is not None and cache.get(f'{PRIMARY_PIN_PREFIX}{store.pk}', False)
+
+
+@contextmanager
+def read_from_replica():
+    """Route the reads of the enclosed block to the replica, until it writes something."""
+    token = _replica_reads.set({'wrote': False})
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Send the reads made inside `read_from_replica()` to the replica and every
+    other query to the primary. The first write inside the block pins the
+    rest of it to the primary, so a request always reads its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _replica_reads.get()
+        if state is not None and not state['wrote']:
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _replica_reads.get()
+        if state is not None:
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary (replication or sync_replica)
+        return db != replica_alias()
+
+
+class ReplicaReadMixin:
+    """Serve a view's GET requests from the replica, unless the request's store is pinned to the primary."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            with read_from_replica():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # The store is known once the request is authenticated
+        state = _replica_reads.get()
+        if state is not None and pinned_to_primary(getattr(request, 'store', None)):
+            state['wrote'] = True
@@ -1,6 +1,60 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ParseError
 from .models import StockXUser, StoreUser, Store, Product, Stock, SalesTransaction, StockTransaction, Color, Category, SizeRange, Brand
 
+def split_fields(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+def requested_fieldset(request):
+    """The (fields, expand) query parameters of a GET request, None when absent."""
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None, None
+    return request.query_params.get('fields') or None, request.query_params.get('expand') or None
+
+def restrict_fields(serializer, selection):
+    """Keep the fields of `serializer` named in the `selection` tree ({name: {sub-field: ...}})."""
+    fields = serializer.fields
+    unknown = set(selection) - set(fields)
+    if unknown:
+        raise ParseError(f"Unknown field(s) {', '.join(sorted(unknown))} in fields")
+    for name in list(fields):
+        if name not in selection:
+            fields.pop(name)
+        elif selection[name]:
+            nested = getattr(fields[name], 'child', fields[name])
+            if not isinstance(nested, serializers.Serializer):
+                raise ParseError(f"{name} has no fields to select")
+            restrict_fields(nested, selection[name])
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets for read serializers, given as the `fields` / `expand`
+    keyword arguments or a GET request's ?fields= / ?expand= (comma separated).
+
+    `fields` keeps only the listed fields; a dotted path (`product.name`)
+    selects inside a nested serializer, which keeps all of its fields when
+    named alone. `expand` renders the listed `Meta.expandable` relations as
+    nested objects instead of ids.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and expand is None:
+            fields, expand = requested_fieldset(self.context.get('request'))
+        for name in split_fields(expand):
+            expandable = getattr(self.Meta, 'expandable', {})
+            if name not in expandable:
+                raise ParseError(f"{name} can't be expanded")
+            many = self.Meta.model._meta.get_field(name).many_to_many
+            self.fields[name] = expandable[name](many=many, read_only=True)
+        if fields:
+            selection = {}
+            for path in split_fields(fields):
+                node = selection
+                for name in path.split('.'):
+                    node = node.setdefault(name, {})
+            restrict_fields(self, selection)
+
 class StockXUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = StockXUser
@@ -35,12 +89,13 @@ class ColorSerializer(serializers.ModelSerializer):
         model = Color
         fields = ['id', 'name', 'color_code']
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         exclude = ['created_at', 'updated_at', 'is_active']
+        expandable = {'category': CategorySerializer, 'brand': BrandSerializer, 'size_range': SizeRangeSerializer, 'colors': ColorSerializer}
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer()
     brand = BrandSerializer()
     colors = ColorSerializer(many=True)
@@ -49,7 +104,7 @@ class ProductListSerializer(serializers.ModelSerializer):
         model = Product
         exclude = ['created_at', 'updated_at', 'is_active']
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer()
     brand = BrandSerializer()
     size_range = SizeRangeSerializer()
@@ -64,31 +119,33 @@ class StockSerializer(serializers.ModelSerializer):
         model = Stock
         fields = '__all__'
 
-class SalesTransactionSerializer(serializers.ModelSerializer):
+class SalesTransactionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = SalesTransaction
         fields = '__all__'
+        expandable = {'product': ProductListSerializer}
 
-class StockTransactionSerializer(serializers.ModelSerializer):
+class StockTransactionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = StockTransaction
         fields = '__all__'
+        expandable = {'product': ProductListSerializer}
 
-class SalesTransactionListSerializer(serializers.ModelSerializer):
+class SalesTransactionListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product = ProductListSerializer()
 
     class Meta:
         model = SalesTransaction
         fields = '__all__'
 
-class StockTransactionListSerializer(serializers.ModelSerializer):
+class StockTransactionListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product = ProductListSerializer()
 
     class Meta:
         model = StockTransaction
         fields = '__all__'
 
-class StockDetailSerializer(serializers.ModelSerializer):
+class StockDetailSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product = ProductListSerializer()
 
     class Meta:
@@ -108,4 +165,13 @@ class ProductReportSerializer(serializers.Serializer):
     total_stock_on_hand = serializers.IntegerField()
     total_stock_value = serializers.DecimalField(max_digits=10, decimal_places=2)
     best_selling_product = serializers.DictField(child=serializers.CharField())
-    least_selling_product = serializers.DictField(child=serializers.CharField())
\ No newline at end of file
+    least_selling_product = serializers.DictField(child=serializers.CharField())
+
+class SalesCartLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity_sold = serializers.IntegerField(min_value=1)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+class SalesCartSerializer(serializers.Serializer):
+    sold_by = serializers.CharField(max_length=100)
+    lines = SalesCartLineSerializer(many=True, allow_empty=False)
@@ -0,0 +1,201 @@
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.signals import post_delete, post_save
+
+from .models import (
+    Brand, Category, Color, DailyProductRollup, Product, SalesTransaction, SizeRange, Stock,
+    StockTransaction, StockXUser, Store,
+)
+
+SHARD_PREFIX = 'store_'
+
+# A store's operational rows, kept in that store's shard
+SHARDED_MODELS = (Product, Product.colors.through, Stock, StockTransaction, SalesTransaction, DailyProductRollup)
+# Central rows the sharded ones reference. The central database owns them; every shard keeps
+# a copy so joins (select_related, the colors M2M) and foreign keys work inside a shard.
+# Ordered so a row's foreign keys are copied before it.
+MIRRORED_MODELS = (StockXUser, Store, Brand, Category, SizeRange, Color)
+
+# Store id whose shard the current request's operational queries go to
+_current_store = ContextVar('current_store', default=None)
+_lock = threading.Lock()
+
+
+def sharding_enabled():
+    return getattr(settings, 'STORE_SHARDING', False)
+
+
+def shard_alias(store_id):
+    return f'{SHARD_PREFIX}{store_id}'
+
+
+def shard_path(store_id):
+    return Path(settings.STORE_SHARD_DIRECTORY) / f'{shard_alias(store_id)}.sqlite3'
+
+
+def current_shard():
+    """
+    The alias of the active store's shard, or None outside a store's request and for
+    stores `shard_stores` hasn't moved to a shard yet (their rows are still central).
+    """
+    store_id = _current_store.get()
+    if store_id is None or not sharding_enabled():
+        return None
+    alias = shard_alias(store_id)
+    if alias in connections.settings:
+        return alias
+    # A shard only appears under its name once it holds the store's rows, see provision_shard()
+    path = shard_path(store_id)
+    if not path.exists():
+        return None
+    with _lock:
+        _register(alias, path)
+    return alias
+
+
+def activate_store(store):
+    """Route the operational queries of the current context to `store`'s shard, once it has one."""
+    return _current_store.set(store.pk if store is not None else None)
+
+
+def deactivate_store(token):
+    _current_store.reset(token)
+
+
+def _register(alias, path):
+    # Declare the shard's connection the way settings.DATABASES entries are: the central
+    # SQLite profile (OPTIONS, CONN_MAX_AGE...) pointed at the shard's file
+    if alias in connections.settings:
+        return
+    default = settings.DATABASES[DEFAULT_DB_ALIAS]
+    if 'sqlite3' not in default['ENGINE']:
+        raise ImproperlyConfigured("STORE_SHARDING splits a SQLite database into per-store files")
+    config = {key: value for key, value in default.items() if key != 'TEST'}
+    config['NAME'] = str(path)
+    connections.settings[alias] = connections.configure_settings({DEFAULT_DB_ALIAS: dict(default), alias: config})[alias]
+    settings.DATABASES[alias] = config
+
+
+def shard_aliases():
+    """Register and return the alias of every shard present in STORE_SHARD_DIRECTORY."""
+    directory = Path(settings.STORE_SHARD_DIRECTORY)
+    aliases = []
+    for path in sorted(directory.glob(f'{SHARD_PREFIX}*.sqlite3')):
+        _register(path.stem, path)
+        aliases.append(path.stem)
+    return aliases
+
+
+def provision_shard(store_id):
+    """
+    Return the alias of the store's shard, first building it if needed: its database is
+    created and migrated under a temporary name, filled with the mirrored tables and the
+    store's rows, and only then renamed into place, which is what makes the router send
+    the store's queries to it. Run by `shard_stores`, never during a request.
+    """
+    alias = shard_alias(store_id)
+    path = shard_path(store_id)
+    if path.exists():
+        _register(alias, path)
+        return alias
+
+    from django.core.management import call_command
+    building = path.with_name(path.name + '.building')
+    building.unlink(missing_ok=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _register(alias, building)
+    call_command('migrate', database=alias, interactive=False, verbosity=0)
+    copy_mirrored_rows(alias)
+    for model, rows in store_rows(store_id):
+        copy_rows(model, rows.iterator(), alias)
+    # Closing the only connection checkpoints the WAL into the file, which can then move
+    connections[alias].close()
+    building.replace(path)
+    connections.settings[alias]['NAME'] = settings.DATABASES[alias]['NAME'] = str(path)
+    return alias
+
+
+def store_rows(store_id):
+    """(model, central queryset) of each sharded model's rows belonging to the store."""
+    for model in SHARDED_MODELS:
+        scope = {'product__store_id': store_id} if model is Product.colors.through else {'store_id': store_id}
+        yield model, model.objects.using(DEFAULT_DB_ALIAS).filter(**scope).order_by('pk')
+
+
+def copy_mirrored_rows(alias):
+    """Bring the shard's copy of the central tables up to date."""
+    for model in MIRRORED_MODELS:
+        copy_rows(model, model.objects.using(DEFAULT_DB_ALIAS).order_by('pk'), alias)
+
+
+def copy_rows(model, instances, alias):
+    """Insert or update `instances` of `model` in the `alias` database, keeping their primary keys."""
+    fields = [field.attname for field in model._meta.concrete_fields if not field.primary_key]
+    # Fresh instances, bulk_create would otherwise move the caller's to the shard
+    rows = [model(**{field.attname: getattr(instance, field.attname) for field in model._meta.concrete_fields})
+            for instance in instances]
+    if rows:
+        model.objects.using(alias).bulk_create(rows, update_conflicts=True, unique_fields=['id'], update_fields=fields)
+
+
+def mirror_save(sender, instance, using, raw=False, **kwargs):
+    """post_save receiver copying a central row to every shard."""
+    if using != DEFAULT_DB_ALIAS or not sharding_enabled():
+        return
+    for alias in shard_aliases():
+        copy_rows(sender, [instance], alias)
+
+
+def mirror_delete(sender, instance, using, **kwargs):
+    """post_delete receiver removing a central row, and what cascades from it, from every shard."""
+    if using != DEFAULT_DB_ALIAS or not sharding_enabled():
+        return
+    for alias in shard_aliases():
+        sender.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+for model in MIRRORED_MODELS:
+    post_save.connect(mirror_save, sender=model, dispatch_uid=f'mirror_{model.__name__}_save')
+    post_delete.connect(mirror_delete, sender=model, dispatch_uid=f'mirror_{model.__name__}_delete')
+
+
+class StoreShardRouter:
+    """
+    With settings.STORE_SHARDING, keep each store's products, stock,
+    transactions and rollups in a database file of its own
+    (STORE_SHARD_DIRECTORY/store_<id>.sqlite3), so a large store's tables and
+    write lock don't slow the others down. Everything else, the sharded
+    models outside a store's request (admin, management commands), and the
+    stores `shard_stores` hasn't moved yet stay in the central database; the
+    router leaves those queries to the next one.
+    """
+
+    def _shard(self, model, hints):
+        if not sharding_enabled() or model not in SHARDED_MODELS:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db is not None:
+            # Follow the row (and related managers of the row) to the database it came from
+            return instance._state.db
+        return current_shard()
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # A shard holds copies of the central rows its own rows point to
+        return True if sharding_enabled() else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db.startswith(SHARD_PREFIX):
+            # A shard holds core's tables: its own rows and the mirrored central ones
+            return app_label == 'core'
+        return None
@@ -0,0 +1,20 @@
+from django.conf import settings
+
+
+def apply_pragmas(cursor, pragmas):
+    """Run `PRAGMA name = value` for each of `pragmas` on a DB-API cursor."""
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created receiver applying settings.SQLITE_PRAGMAS to new SQLite connections."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    if connection.is_in_memory_db():
+        # An in-memory database (the test database) has no journal file or pages to map
+        pragmas.pop('journal_mode', None)
+        pragmas.pop('mmap_size', None)
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas)
@@ -0,0 +1,78 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .tests import StoreDataMixin
+
+# Tables growing with a store's history; the small reference tables may be scanned
+LARGE_TABLES = {'core_product', 'core_product_colors', 'core_stock', 'core_stocktransaction', 'core_salestransaction', 'core_dailyproductrollup'}
+
+# "SCAN core_stock" or "SCAN core_stock USING INDEX ..." (a full index walk), but not a SEARCH;
+# SQLite before 3.36 writes "SCAN TABLE core_stock"
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+
+class QueryPlanTestCase(StoreDataMixin, APITestCase):
+    """Run EXPLAIN QUERY PLAN on every query the hot endpoints issue and fail on full scans of large tables."""
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plans are checked with SQLite EXPLAIN QUERY PLAN')
+        self.add_products(20)
+
+    def assertNoFullScans(self, method, url, data=None, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json', **extra)
+            # Streaming responses only query while being consumed
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 300)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            scans = [step for step in plan if (match := FULL_SCAN.match(step)) and match.group(1) in LARGE_TABLES]
+            self.assertFalse(scans, f"{method.upper()} {url} scans a whole table:\n{sql}\n" + "\n".join(plan))
+
+    def test_product_lists(self):
+        self.assertNoFullScans('get', reverse('products-list'))
+        self.assertNoFullScans('get', reverse('products-list'), {'since': timezone.now().isoformat()})
+        self.assertNoFullScans('get', reverse('products-by-category', kwargs={'category': self.category.pk}))
+        self.assertNoFullScans('get', reverse('products-by-brand', kwargs={'brand': self.brand.pk}))
+        self.assertNoFullScans('get', reverse('product-detail', kwargs={'pk': self.products[0].pk}))
+
+    def test_stock_lists(self):
+        self.assertNoFullScans('get', reverse('stocks-list'))
+        self.assertNoFullScans('get', reverse('stocks-list'), {'since': timezone.now().isoformat()})
+        self.assertNoFullScans('get', reverse('stock-detail', kwargs={'pk': self.products[0].stock.pk}))
+
+    def test_transaction_lists(self):
+        dates = {'start_date': '2024-01-01', 'end_date': '2030-12-31', 'page_size': 5}
+        for url_name in ['stock-transactions', 'sales-transactions']:
+            with self.subTest(url_name):
+                self.assertNoFullScans('get', reverse(url_name))
+                self.assertNoFullScans('get', reverse(url_name), dates)
+
+    def test_exports(self):
+        for url_name in ['stock-transactions-export', 'sales-transactions-export']:
+            with self.subTest(url_name):
+                self.assertNoFullScans('get', reverse(url_name), HTTP_ACCEPT='text/csv')
+                self.assertNoFullScans('get', reverse(url_name), {'product': self.products[0].pk}, HTTP_ACCEPT='text/csv')
+
+    def test_report(self):
+        self.assertNoFullScans('get', reverse('report'))
+        self.assertNoFullScans('get', reverse('report'), {'start_date': '2024-01-01', 'end_date': '2030-12-31'})
+
+    def test_sales(self):
+        product = self.products[0]
+        self.assertNoFullScans('post', reverse('sales-create'), {'store': self.store.pk, 'product': product.pk, 'quantity_sold': 1, 'sold_by': 'admin'})
+        lines = [{'product': product.pk, 'quantity_sold': 1} for product in self.products[:3]]
+        self.assertNoFullScans('post', reverse('sales-cart'), {'sold_by': 'admin', 'lines': lines})
@@ -1,3 +1,764 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import shutil
+import tempfile
+from base64 import urlsafe_b64encode
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from . import views
+from .authentication import resolve_identity
+from .parsers import ORJSONParser
+from .readers import ValuesListMixin
+from .renderers import ORJSONRenderer
+from .routers import ReadReplicaRouter, pinned_to_primary, read_from_replica
+from .sharding import shard_alias
+from .sqlite import configure_sqlite
+from .writer import GroupCommitWriter
+from .models import (
+    StockXUser, Brand, Category, SizeRange, Color, Store, StoreUser, Product, Stock, SalesTransaction, StockTransaction,
+    DailyProductRollup,
+)
+
+
+class StoreDataMixin:
+    """Seeds a store owned by the views' default Telegram user and creates stocked products on demand."""
+
+    def setUp(self):
+        self.owner = StockXUser.objects.create(tg_id='441609134', first_name='admin', last_name='admin')
+        self.store = Store.objects.create(owner=self.owner, name='Main', location='Addis Ababa')
+        self.category = Category.objects.create(name='Shoes')
+        self.brand = Brand.objects.create(name='Nike')
+        self.size_range = SizeRange.objects.create(name='EU', size_value='40')
+        self.colors = [Color.objects.create(name=name, color_code=code) for name, code in [('Red', '#f00'), ('Blue', '#00f')]]
+        self.products = []
+
+    def add_products(self, count):
+        """Create `count` products, each with colors, stock, a stock transaction and a sale."""
+        for _ in range(count):
+            index = len(self.products)
+            product = Product.objects.create(
+                store=self.store, name=f'Product {index}', code=f'P{index}', description='',
+                category=self.category, brand=self.brand, size_range=self.size_range, initial_quantity=10, cost_price='5.00', selling_price='8.00',
+            )
+            product.colors.set(self.colors)
+            Stock.objects.create(store=self.store, product=product, stock_on_hand=10)
+            StockTransaction.objects.create(store=self.store, product=product, quantity=10, stock_type='1', modified_by='admin')
+            SalesTransaction.objects.create(store=self.store, product=product, quantity_sold=1, sold_by='admin')
+            self.products.append(product)
+
+
+class QueryCountTestCase(StoreDataMixin, APITestCase):
+
+    def assertConstantQueries(self, url, add_rows):
+        """Fail if GET `url` runs more queries after `add_rows()` has added more data."""
+        # Resolve the Telegram user's store once, so both measured requests hit the identity cache
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as before:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        add_rows()
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(before), len(after),
+            f"{url} ran {len(before)} queries before and {len(after)} after adding rows:\n"
+            + "\n".join(query['sql'] for query in after.captured_queries)
+        )
+
+    def assertConstantListQueries(self, url_name, **kwargs):
+        self.add_products(2)
+        self.assertConstantQueries(reverse(url_name, kwargs=kwargs), lambda: self.add_products(5))
+
+    def test_products_list(self):
+        self.assertConstantListQueries('products-list')
+
+    def test_products_by_category(self):
+        self.assertConstantListQueries('products-by-category', category=self.category.pk)
+
+    def test_products_by_brand(self):
+        self.assertConstantListQueries('products-by-brand', brand=self.brand.pk)
+
+    def test_product_detail(self):
+        self.add_products(1)
+        product = self.products[0]
+        more_colors = lambda: product.colors.add(*[Color.objects.create(name=f'Color {i}', color_code='#000') for i in range(5)])
+        self.assertConstantQueries(reverse('product-detail', kwargs={'pk': product.pk}), more_colors)
+
+    def test_stocks_list(self):
+        self.assertConstantListQueries('stocks-list')
+
+    def test_stock_detail(self):
+        self.add_products(1)
+        stock = self.products[0].stock
+        self.assertConstantQueries(reverse('stock-detail', kwargs={'pk': stock.pk}), lambda: self.add_products(5))
+
+    def test_stock_transactions(self):
+        self.assertConstantListQueries('stock-transactions')
+
+    def test_sales_transactions(self):
+        self.assertConstantListQueries('sales-transactions')
+
+    def test_report(self):
+        self.assertConstantListQueries('report')
+
+    def test_reference_lists(self):
+        for url_name in ['brands', 'categories', 'size-ranges', 'colors', 'stores']:
+            with self.subTest(url_name):
+                self.assertConstantListQueries(url_name)
+
+
+class ProductReportTestCase(StoreDataMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        products = []
+        for code, cost_price, stock in [('A1', Decimal('5.00'), 10), ('B1', Decimal('3.00'), 4)]:
+            product = Product.objects.create(
+                store=self.store, name=code, code=code, description='', category=self.category, brand=self.brand,
+                size_range=self.size_range, initial_quantity=stock, cost_price=cost_price, selling_price=Decimal('8.00'),
+            )
+            response = self.client.post(reverse('stocks-create'), {'store': self.store.pk, 'product': product.pk, 'stock_on_hand': stock}, format='json')
+            self.assertEqual(response.status_code, 201)
+            products.append(product)
+        response = self.client.post(reverse('sales-create'), {'store': self.store.pk, 'product': products[0].pk, 'quantity_sold': 3, 'sold_by': 'admin'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        # Yesterday's restock and sale of B1, recorded before today's stock rows
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+        DailyProductRollup.objects.create(store=self.store, product=products[1], date=self.yesterday, units_in=6, units_out=2, units_sold=2,
+                                          revenue=Decimal('16.00'), cost=Decimal('6.00'))
+
+    def report(self, **params):
+        response = self.client.get(reverse('report'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_report(self):
+        self.assertEqual(self.report(), {
+            'total_stock_in': 20,
+            'total_stock_out': -5,
+            'total_stock_on_hand': 15,
+            # What is on hand at each product's own cost price: 7 x 5.00 + 4 x 3.00
+            'total_stock_value': '47.00',
+            'best_selling_product': {'products': "['A1']", 'quantity_sold': '3'},
+            'least_selling_product': {'products': "['B1']", 'quantity_sold': '2'},
+        })
+
+    def test_date_range(self):
+        today = self.report(start_date=timezone.localdate().isoformat())
+        self.assertEqual((today['total_stock_in'], today['total_stock_out'], today['total_stock_on_hand']), (14, -3, 11))
+        self.assertEqual(today['least_selling_product'], {'products': "['B1']", 'quantity_sold': '0'})
+
+        yesterday = self.report(start_date=self.yesterday.isoformat(), end_date=self.yesterday.isoformat())
+        self.assertEqual((yesterday['total_stock_in'], yesterday['total_stock_out'], yesterday['total_stock_on_hand']), (6, -2, 4))
+        self.assertEqual(yesterday['best_selling_product'], {'products': "['B1']", 'quantity_sold': '2'})
+        # The stock value is what is on hand now, whatever the range
+        self.assertEqual(yesterday['total_stock_value'], '47.00')
+
+        self.assertEqual(self.client.get(reverse('report'), {'start_date': '2024-13-01'}).status_code, 400)
+
+
+class DailyRollupTestCase(StoreDataMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(
+            store=self.store, name='Runner', code='R1', description='', category=self.category, brand=self.brand,
+            size_range=self.size_range, initial_quantity=0, cost_price='5.00', selling_price='8.00',
+        )
+
+    def record_stock_and_sales(self):
+        response = self.client.post(reverse('stocks-create'), {'store': self.store.pk, 'product': self.product.pk, 'stock_on_hand': 10}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.put(reverse('stocks-update'), {'product': self.product.pk, 'stock_on_hand': 5, 'created_by': 'admin'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        for quantity in (3, 2):
+            response = self.client.post(reverse('sales-create'), {'store': self.store.pk, 'product': self.product.pk, 'quantity_sold': quantity, 'sold_by': 'admin'}, format='json')
+            self.assertEqual(response.status_code, 201)
+
+    def rollups(self):
+        return list(DailyProductRollup.objects.order_by('store', 'product', 'date').values(
+            'store', 'product', 'date', 'units_in', 'units_out', 'units_sold', 'revenue', 'cost'))
+
+    def test_writes_increment_the_day_rollup(self):
+        self.record_stock_and_sales()
+        self.assertEqual(self.rollups(), [{
+            'store': self.store.pk, 'product': self.product.pk, 'date': timezone.localdate(),
+            'units_in': 15, 'units_out': 5, 'units_sold': 5, 'revenue': Decimal('40.00'), 'cost': Decimal('25.00'),
+        }])
+
+    def test_backfill_rebuilds_the_live_rollups(self):
+        self.record_stock_and_sales()
+        live = self.rollups()
+        DailyProductRollup.objects.all().delete()
+        call_command('backfill_rollups', stdout=io.StringIO())
+        self.assertEqual(self.rollups(), live)
+
+
+class LastUnitSaleTestCase(StoreDataMixin, APITestCase):
+
+    def sell(self, product):
+        return self.client.post(reverse('sales-create'), {'store': self.store.pk, 'product': product.pk, 'quantity_sold': 1, 'sold_by': 'admin'}, format='json')
+
+    def test_only_one_sale_gets_the_last_unit(self):
+        self.add_products(1)
+        product = self.products[0]
+        Stock.objects.filter(product=product).update(stock_on_hand=1)
+
+        # A second clerk sells the last unit after the first sale was validated, before it is written
+        write, competing = views.write, []
+        def sell_first(operation):
+            if not competing:
+                competing.append(None)
+                competing[0] = self.sell(product)
+            return write(operation)
+
+        with mock.patch.object(views, 'write', side_effect=sell_first):
+            response = self.sell(product)
+        self.assertEqual(competing[0].status_code, 201)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Stock.objects.get(product=product).stock_on_hand, 0)
+        self.assertEqual(SalesTransaction.objects.filter(product=product).count(), 2)
+        self.assertEqual(StockTransaction.objects.filter(product=product, stock_type='2').count(), 1)
+
+
+class SalesCartTestCase(StoreDataMixin, APITestCase):
+
+    def sell_cart(self, *lines):
+        lines = [{'product': product.pk, 'quantity_sold': quantity} for product, quantity in lines]
+        return self.client.post(reverse('sales-cart'), {'sold_by': 'admin', 'lines': lines}, format='json')
+
+    def test_all_lines_are_recorded(self):
+        self.add_products(2)
+        first, second = self.products
+        response = self.sell_cart((first, 3), (second, 2), (first, 1))
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(all(line['recorded'] and line['error'] is None for line in response.data['lines']))
+        self.assertEqual([line['sale']['quantity_sold'] for line in response.data['lines']], [3, 2, 1])
+
+        self.assertEqual(Stock.objects.get(product=first).stock_on_hand, 6)
+        self.assertEqual(Stock.objects.get(product=second).stock_on_hand, 8)
+        self.assertEqual(StockTransaction.objects.filter(stock_type='2').count(), 3)
+        # One sale per line, on top of the one add_products makes per product
+        self.assertEqual(SalesTransaction.objects.filter(product=first).count(), 3)
+        rollup = DailyProductRollup.objects.get(product=first)
+        self.assertEqual((rollup.units_out, rollup.units_sold, rollup.revenue, rollup.cost), (4, 4, Decimal('32.00'), Decimal('20.00')))
+        self.assertEqual(DailyProductRollup.objects.get(product=second).units_sold, 2)
+
+    def test_oversold_line_records_nothing(self):
+        self.add_products(2)
+        first, second = self.products
+        response = self.sell_cart((first, 3), (second, 11))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([line['error'] is None for line in response.data['lines']], [True, False])
+        self.assertFalse(any(line['recorded'] for line in response.data['lines']))
+
+        self.assertEqual(list(Stock.objects.order_by('pk').values_list('stock_on_hand', flat=True)), [10, 10])
+        self.assertFalse(StockTransaction.objects.filter(stock_type='2').exists())
+        self.assertEqual(SalesTransaction.objects.count(), 2)
+        self.assertFalse(DailyProductRollup.objects.exists())
+
+    def test_invalid_lines(self):
+        self.add_products(1)
+        product = self.products[0]
+        response = self.sell_cart((product, 0))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('lines', response.data)
+
+        unstocked = Product.objects.create(
+            store=self.store, name='Unstocked', code='U1', description='', category=self.category, brand=self.brand,
+            size_range=self.size_range, initial_quantity=0, cost_price='5.00', selling_price='8.00',
+        )
+        response = self.sell_cart((product, 1), (unstocked, 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Stock.objects.get(product=product).stock_on_hand, 10)
+        self.assertEqual(SalesTransaction.objects.count(), 1)
+
+
+class KeysetPaginationTestCase(StoreDataMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add_products(1)
+        product = self.products[0]
+        SalesTransaction.objects.all().delete()
+        # Three sales a day over three days, two of them sharing each timestamp
+        self.days = [timezone.localdate() - timedelta(days=offset) for offset in (2, 1, 0)]
+        for day in self.days:
+            moment = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=12)
+            for created_at in (moment, moment, moment + timedelta(minutes=1)):
+                sale = SalesTransaction.objects.create(store=self.store, product=product, quantity_sold=1, sold_by='admin')
+                SalesTransaction.objects.filter(pk=sale.pk).update(created_at=created_at)
+
+    def walk(self, params):
+        """Follow the next links from the first page and return the ids read and the links followed."""
+        ids, links = [], []
+        response = self.client.get(reverse('sales-transactions'), params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            if response.data['next'] is None:
+                return ids, links
+            links.append(response.data['next'])
+            response = self.client.get(response.data['next'])
+
+    def test_date_range_across_pages(self):
+        start, end = self.days[1].isoformat(), self.days[2].isoformat()
+        ids, links = self.walk({'start_date': start, 'end_date': end, 'page_size': 2})
+        expected = list(SalesTransaction.objects.filter(created_at__date__gte=self.days[1]).order_by('created_at', 'id').values_list('id', flat=True))
+        self.assertEqual(len(expected), 6)
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(links), 2)
+        self.assertTrue(all(f'start_date={start}' in link and f'end_date={end}' in link for link in links))
+
+        # A cursor only moves the start of the range, the dates still bound it
+        ids, _ = self.walk({'end_date': self.days[0].isoformat(), 'page_size': 2})
+        self.assertEqual(len(ids), 3)
+
+    def test_malformed_or_tampered_cursor(self):
+        url = reverse('sales-transactions')
+        for cursor in ['not base64!', urlsafe_b64encode(b'\xff\xfe').decode(), urlsafe_b64encode(b'no separator').decode(),
+                       urlsafe_b64encode(b'2024-99-99T00:00:00|1').decode(), urlsafe_b64encode(b'yesterday|1').decode(),
+                       urlsafe_b64encode(b'2024-01-01T00:00:00|one').decode()]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+class TransactionExportTestCase(StoreDataMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add_products(2)
+        # Another store's history must never be exported
+        other_owner = StockXUser.objects.create(tg_id='7')
+        self.other_store = Store.objects.create(owner=other_owner, name='Other', location='Adama')
+        other = Product.objects.create(
+            store=self.other_store, name='Other', code='O1', description='', category=self.category, brand=self.brand,
+            size_range=self.size_range, initial_quantity=1, cost_price='5.00', selling_price='8.00',
+        )
+        SalesTransaction.objects.create(store=self.other_store, product=other, quantity_sold=1, sold_by='other')
+
+    def export(self, url_name, **params):
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        response, body = self.export('sales-transactions-export')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="sales-transactions.ndjson"')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(row['product_code'], row['store'], row['quantity_sold'], row['total_amount']) for row in rows],
+                         [('P0', self.store.pk, 1, '8.00'), ('P1', self.store.pk, 1, '8.00')])
+
+        _, body = self.export('sales-transactions-export', product=self.products[1].pk)
+        self.assertEqual([json.loads(line)['product_code'] for line in body.splitlines()], ['P1'])
+
+    def test_csv(self):
+        response, body = self.export('stock-transactions-export', format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="stock-transactions.csv"')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], ['id', 'created_at', 'stock_date', 'store', 'product', 'product_code', 'quantity', 'stock_type', 'modified_by'])
+        self.assertEqual([(row[3], row[5], row[6], row[7]) for row in rows[1:]], [(str(self.store.pk), 'P0', '10', '1'), (str(self.store.pk), 'P1', '10', '1')])
+
+        # ?store= narrows within the user's store, it can't reach another one
+        _, body = self.export('sales-transactions-export', format='csv', store=self.other_store.pk)
+        self.assertEqual(body.splitlines()[1:], [])
+
+
+class ConditionalGetTestCase(StoreDataMixin, APITestCase):
+
+    def test_not_modified_until_data_changes(self):
+        self.add_products(2)
+        url = reverse('stocks-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.brand.name = 'Adidas'
+        self.brand.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_keyset_pages_validate_their_own_rows(self):
+        self.add_products(3)
+        url = reverse('sales-transactions')
+        first = self.client.get(url, {'page_size': 2})
+        last = self.client.get(first.data['next'])
+        self.assertEqual(len(last.data['results']), 1)
+
+        # The validator reads the page's rows (page size + 1), not the whole history
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, {'page_size': 2}, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        aggregate = next(query['sql'] for query in queries.captured_queries if 'COUNT(' in query['sql'])
+        self.assertIn('LIMIT 3', aggregate)
+
+        # A new sale lands on the last page only
+        SalesTransaction.objects.create(store=self.store, product=self.products[0], quantity_sold=1, sold_by='admin')
+        self.assertEqual(self.client.get(url, {'page_size': 2}, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(first.data['next'], HTTP_IF_NONE_MATCH=last['ETag']).status_code, 200)
+
+    def test_deletions_and_color_changes_are_not_modified_since(self):
+        self.add_products(2)
+        url = reverse('products-list')
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        # A deleted row leaves the latest updated_at as it was, only the ETag notices
+        self.products[1].delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        etag = self.client.get(url)['ETag']
+        product.colors.remove(self.colors[0])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        product.refresh_from_db()
+        self.assertGreater(product.updated_at, timezone.now() - timedelta(minutes=1))
+
+        updated_at = product.updated_at
+        self.colors[1].product_set.clear()
+        product.refresh_from_db()
+        self.assertGreater(product.updated_at, updated_at)
+
+    def test_query_string_changes_etag(self):
+        self.add_products(2)
+        url = reverse('sales-transactions')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class DeltaSyncTestCase(StoreDataMixin, APITestCase):
+
+    def test_stocks_since_returns_changes_and_tombstones(self):
+        self.add_products(3)
+        url = reverse('stocks-list')
+        response = self.client.get(url, {'since': '1970-01-01T00:00:00Z'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response.data['deleted'], [])
+
+        # Nothing older than the overlap window is sent again
+        since = response.data['since'] + timedelta(seconds=60)
+        Stock.objects.filter(product=self.products[0]).update(stock_on_hand=3, updated_at=since + timedelta(seconds=1))
+        Product.objects.filter(pk=self.products[1].pk).update(is_active=False, updated_at=since + timedelta(seconds=1))
+        response = self.client.get(url, {'since': since.isoformat()})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.products[0].stock.pk])
+        self.assertEqual(response.data['results'][0]['stock_on_hand'], 3)
+        self.assertEqual(response.data['deleted'], [self.products[1].stock.pk])
+
+    def test_products_without_since_returns_full_list(self):
+        self.add_products(2)
+        response = self.client.get(reverse('products-list'))
+        self.assertEqual(len(response.data), 2)
+
+    def test_invalid_since(self):
+        response = self.client.get(reverse('products-list'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class IdentityTestCase(StoreDataMixin, APITestCase):
+
+    def test_resolution_is_cached_until_stores_change(self):
+        self.assertEqual(resolve_identity('441609134').store, self.store)
+        with self.assertNumQueries(0):
+            resolve_identity('441609134')
+
+        member = StockXUser.objects.create(tg_id='42')
+        self.assertIsNone(resolve_identity('42').store)
+        StoreUser.objects.create(store=self.store, user=member, role='Sales Manager', verified=True)
+        self.assertEqual(resolve_identity('42').store, self.store)
+
+    def test_views_use_resolved_store(self):
+        self.add_products(1)
+        other_owner = StockXUser.objects.create(tg_id='7')
+        other_store = Store.objects.create(owner=other_owner, name='Other', location='Adama')
+        response = self.client.get(reverse('stocks-list'))
+        self.assertEqual(len(response.data), 1)
+
+        response = self.client.generic('GET', reverse('stocks-list'), '{"user": {"tg_id": "7"}}', content_type='application/json')
+        self.assertEqual(response.data, [])
+        self.assertEqual(response.wsgi_request.store, other_store)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'The pragmas apply to SQLite connections')
+class SQLiteProfileTestCase(SimpleTestCase):
+
+    def connect(self, name):
+        """Open a new connection to the SQLite database `name` the way Django opens the default one."""
+        config = connections.configure_settings({DEFAULT_DB_ALIAS: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name}})[DEFAULT_DB_ALIAS]
+        wrapper = type(connections[DEFAULT_DB_ALIAS])(config, alias='sqlite_profile')
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragmas(self, wrapper, *names):
+        with wrapper.cursor() as cursor:
+            return [cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in names]
+
+    def test_new_connections_get_the_pragmas(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        wrapper = self.connect(f'{directory}/db.sqlite3')
+        self.assertEqual(
+            self.pragmas(wrapper, 'journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'temp_store'),
+            # synchronous NORMAL is 1, temp_store MEMORY is 2
+            ['wal', 1, settings.SQLITE_PRAGMAS['busy_timeout'], settings.SQLITE_PRAGMAS['cache_size'], 2],
+        )
+        self.assertEqual(self.pragmas(wrapper, 'mmap_size'), [settings.SQLITE_PRAGMAS['mmap_size']])
+
+    def test_in_memory_database_keeps_its_journal(self):
+        # No journal file to switch to WAL and no file to map; the other pragmas still apply
+        wrapper = self.connect(':memory:')
+        self.assertEqual(self.pragmas(wrapper, 'journal_mode', 'synchronous', 'cache_size'), ['memory', 1, settings.SQLITE_PRAGMAS['cache_size']])
+
+    def test_other_databases_are_left_alone(self):
+        postgres = mock.Mock(vendor='postgresql')
+        configure_sqlite(sender=type(postgres), connection=postgres)
+        postgres.cursor.assert_not_called()
+
+
+class GroupCommitWriterTestCase(TransactionTestCase):
+
+    def test_failed_operation_does_not_affect_its_batch(self):
+        writer = GroupCommitWriter(max_batch=10, max_delay=0.2)
+
+        def create(name):
+            return lambda: Brand.objects.create(name=name).name
+
+        def fail():
+            Brand.objects.create(name='Rolled back')
+            raise ValidationError('Not enough stock')
+
+        with ThreadPoolExecutor(3) as pool:
+            futures = [pool.submit(writer.submit, operation) for operation in [create('Nike'), fail, create('Puma')]]
+        self.assertEqual(futures[0].result(), 'Nike')
+        self.assertEqual(futures[2].result(), 'Puma')
+        with self.assertRaises(ValidationError):
+            futures[1].result()
+        self.assertEqual(sorted(Brand.objects.values_list('name', flat=True)), ['Nike', 'Puma'])
+
+
+@override_settings(WRITE_QUEUE_ENABLED=True)
+class WriteQueueViewTestCase(StoreDataMixin, TransactionTestCase):
+
+    def test_sale_through_write_queue(self):
+        self.add_products(1)
+        product = self.products[0]
+        response = self.client.post(reverse('sales-create'), {'store': self.store.pk, 'product': product.pk, 'quantity_sold': 4, 'sold_by': 'admin'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(reverse('sales-create'), {'store': self.store.pk, 'product': product.pk, 'quantity_sold': 7, 'sold_by': 'admin'}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Stock.objects.get(product=product).stock_on_hand, 6)
+
+
+# Any configured alias will do to exercise the routing decisions
+@override_settings(REPLICA_DATABASE_ALIAS='default')
+class ReadReplicaRouterTestCase(StoreDataMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_reads_go_to_replica_until_a_write(self):
+        router = ReadReplicaRouter()
+        self.assertIsNone(router.db_for_read(Product))
+        with read_from_replica():
+            self.assertEqual(router.db_for_read(Product), 'default')
+            self.assertEqual(router.db_for_write(Product), 'default')
+            self.assertIsNone(router.db_for_read(Product))
+
+    def test_write_pins_store_to_primary(self):
+        self.add_products(1)
+        other_store = Store.objects.create(owner=StockXUser.objects.create(tg_id='7'), name='Other', location='Adama')
+        response = self.client.post(reverse('sales-create'), {'store': self.store.pk, 'product': self.products[0].pk, 'quantity_sold': 1, 'sold_by': 'admin'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(pinned_to_primary(self.store))
+        self.assertFalse(pinned_to_primary(other_store))
+
+        # Only the writing store's reads skip the replica, whoever's client sends them
+        url = reverse('sales-transactions')
+        with mock.patch('core.routers.replica_alias', return_value='default') as replica:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse(replica.called)
+        with mock.patch('core.routers.replica_alias', return_value='default') as replica:
+            self.assertEqual(self.client.generic('GET', url, '{"user": {"tg_id": "7"}}', content_type='application/json').status_code, 200)
+        self.assertTrue(replica.called)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Stores are sharded into SQLite files')
+@override_settings(STORE_SHARDING=True, DATABASE_ROUTERS=['core.sharding.StoreShardRouter', 'core.routers.ReadReplicaRouter'])
+class StoreShardingTestCase(StoreDataMixin, APITestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.enterContext(override_settings(STORE_SHARD_DIRECTORY=directory))
+        super().setUp()
+        # The shard's alias only exists once shard_stores has created it
+        alias = shard_alias(self.store.pk)
+        self.enterContext(mock.patch.object(type(self), 'databases', self.databases | {alias}))
+        self.addCleanup(self.forget_shard, alias)
+
+    def forget_shard(self, alias):
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+        settings.DATABASES.pop(alias, None)
+
+    def shard_stores(self):
+        call_command('shard_stores', stdout=io.StringIO())
+        return shard_alias(self.store.pk)
+
+    def test_stores_are_central_until_moved(self):
+        self.add_products(2)
+        url = reverse('products-list')
+        self.assertEqual(len(self.client.get(url).json()), 2)
+        # Requests don't create (or migrate) shards
+        self.assertNotIn(shard_alias(self.store.pk), connections.settings)
+
+        alias = self.shard_stores()
+        self.assertEqual(Product.objects.using(alias).filter(store=self.store).count(), 2)
+        self.assertEqual(SalesTransaction.objects.using(alias).filter(store=self.store).count(), 2)
+        self.assertEqual(Product.colors.through.objects.using(alias).count(), 4)
+        self.assertFalse(Product.objects.using('default').filter(store=self.store).exists())
+        self.assertEqual([product['code'] for product in self.client.get(url).json()], ['P0', 'P1'])
+
+    def test_store_rows_live_in_store_shard(self):
+        alias = self.shard_stores()
+        response = self.client.post(reverse('products-create'), {
+            'store': self.store.pk, 'name': 'Air', 'code': 'AIR', 'description': 'Runner', 'category': self.category.pk, 'brand': self.brand.pk,
+            'size_range': self.size_range.pk, 'colors': [color.pk for color in self.colors], 'initial_quantity': 3, 'cost_price': '1.00', 'selling_price': '2.00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Product.objects.using(alias).filter(code='AIR').exists())
+        self.assertFalse(Product.objects.using('default').filter(code='AIR').exists())
+        self.assertEqual([product['code'] for product in self.client.get(reverse('products-list')).json()], ['AIR'])
+
+        # Central reference rows are mirrored into the shard
+        brand = Brand.objects.create(name='Puma')
+        self.assertTrue(Brand.objects.using(alias).filter(pk=brand.pk, name='Puma').exists())
+
+    def test_export_reads_store_shard(self):
+        alias = self.shard_stores()
+        product = Product.objects.using(alias).create(
+            store=self.store, name='Air', code='AIR', description='Runner', category=self.category, brand=self.brand,
+            size_range=self.size_range, initial_quantity=3, cost_price=Decimal('1.00'), selling_price=Decimal('2.00'),
+        )
+        SalesTransaction.objects.using(alias).create(store=self.store, product=product, quantity_sold=2, sold_by='admin')
+
+        self.assertEqual(len(self.client.get(reverse('sales-transactions')).json()['results']), 1)
+        response = self.client.get(reverse('sales-transactions-export'))
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['product_code'], row['quantity_sold']) for row in rows], [('AIR', 2)])
+
+
+class ValuesSerializerTestCase(StoreDataMixin, APITestCase):
+
+    def test_same_json_as_model_serializers(self):
+        self.add_products(3)
+        for url in [reverse('products-list'), reverse('products-by-brand', args=[self.brand.pk]), reverse('stocks-list'),
+                    reverse('stock-transactions'), reverse('sales-transactions') + '?page_size=2']:
+            fast = self.client.get(url).json()
+            with mock.patch.object(ValuesListMixin, 'values_serializer', False):
+                self.assertEqual(fast, self.client.get(url).json(), url)
+
+    def test_pages_follow_cursor(self):
+        self.add_products(3)
+        url, codes = reverse('sales-transactions') + '?page_size=2', []
+        while url:
+            page = self.client.get(url).json()
+            codes += [sale['product']['code'] for sale in page['results']]
+            url = page['next']
+        self.assertEqual(codes, ['P0', 'P1', 'P2'])
+
+
+class NormalizedListTestCase(StoreDataMixin, APITestCase):
+
+    def test_transactions_side_load_products(self):
+        self.add_products(2)
+        SalesTransaction.objects.create(store=self.store, product=self.products[0], quantity_sold=1, sold_by='admin')
+        full = self.client.get(reverse('sales-transactions')).json()
+        normalized = self.client.get(reverse('sales-transactions'), {'format': 'normalized'}).json()
+
+        self.assertEqual([sale['product'] for sale in normalized['results']], [sale['product']['id'] for sale in full['results']])
+        included = normalized['included']
+        self.assertEqual(sorted(included['products']), [str(product.pk) for product in self.products])
+        for sale in full['results']:
+            product = included['products'][str(sale['product']['id'])]
+            self.assertEqual(product['code'], sale['product']['code'])
+            self.assertEqual(included['categories'][str(product['category'])], sale['product']['category'])
+            self.assertEqual([included['colors'][str(color)] for color in product['colors']], sale['product']['colors'])
+
+
+class FastJSONTestCase(StoreDataMixin, APITestCase):
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'price': Decimal('8.50'), 'at': timezone.now(), 'day': timezone.localdate(), 'text': 'caf\u00e9 \u2028',
+            'nested': [{1: None, 'ok': True, 'ratio': 0.1}], 'big': 2 ** 70,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_parser(self):
+        self.assertEqual(ORJSONParser().parse(io.BytesIO('{"name": "caf\u00e9", "price": 8.5}'.encode())), {'name': 'caf\u00e9', 'price': 8.5})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"price": NaN}'))
+
+    def test_large_lists_are_compressed(self):
+        self.add_products(20)
+        plain = self.client.get(reverse('stocks-list'))
+        response = self.client.get(reverse('stocks-list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+
+class SparseFieldsTestCase(StoreDataMixin, APITestCase):
+    fields = 'id,stock_on_hand,product.id,product.name,product.code,product.category.id'
+
+    def test_fields_select_nested_columns(self):
+        self.add_products(2)
+        rows = self.client.get(reverse('stocks-list'), {'fields': self.fields}).json()
+        self.assertEqual(rows[0], {
+            'id': rows[0]['id'], 'product': {'id': self.products[0].pk, 'category': {'id': self.category.pk}, 'name': 'Product 0', 'code': 'P0'}, 'stock_on_hand': 10,
+        })
+        with mock.patch.object(ValuesListMixin, 'values_serializer', False), CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('stocks-list'), {'fields': self.fields}).json(), rows)
+        # only() leaves the unrendered columns out of the SQL
+        self.assertFalse(any('"core_product"."description"' in query['sql'] for query in queries.captured_queries))
+
+    def test_expand_and_unknown_fields(self):
+        self.add_products(1)
+        product = self.client.get(reverse('products-by-brand', args=[self.brand.pk]), {'fields': 'id,category', 'expand': 'category'}).json()[0]
+        self.assertEqual(product, {'id': self.products[0].pk, 'category': {'id': self.category.pk, 'name': 'Shoes'}})
+        self.assertEqual(self.client.get(reverse('stocks-list'), {'fields': 'id,nope'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('stocks-list'), {'expand': 'product'}).status_code, 400)
@@ -26,7 +26,10 @@ urlpatterns = [
     path('stocks/<int:pk>/', views.StockDetailAPIView.as_view(), name='stock-detail'),
     path('stock-transactions/', views.StockTransactionListAPIView.as_view(), name='stock-transactions'),
     path('sales-transactions/', views.SalesTransactionListAPIView.as_view(), name='sales-transactions'),
+    path('stock-transactions/export/', views.StockTransactionExportAPIView.as_view(), name='stock-transactions-export'),
+    path('sales-transactions/export/', views.SalesTransactionExportAPIView.as_view(), name='sales-transactions-export'),
     path('sales/create/', views.SalesTransactionCreateAPIView.as_view(), name='sales-create'),
+    path('sales/cart/', views.SalesCartCreateAPIView.as_view(), name='sales-cart'),
     
     path('reports/', views.ProductPerformanceAPIView.as_view(), name='report'),
 ]
\ No newline at end of file
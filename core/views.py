@@ -1,12 +1,57 @@
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.exceptions import ParseError
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.http import StreamingHttpResponse
 from django.db.models import Sum
-from django.db.models import F
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.core.exceptions import ValidationError
 from .models import StockXUser
-from .models import StockXUser,StoreUser, Brand, Category, SizeRange, Color, Store, Product, Stock, SalesTransaction, StockTransaction
+from .models import StockXUser,StoreUser, Brand, Category, SizeRange, Color, Store, Product, Stock, SalesTransaction, StockTransaction, DailyProductRollup
 from .serializers import *
+from .pagination import KeysetPagination
+from .conditional import ConditionalListMixin
+from .delta import DeltaSyncMixin
+from .normalized import NormalizedListMixin
+from .readers import SparseFieldsMixin, ValuesListMixin
+from .routers import ReplicaReadMixin
+from .renderers import NDJSONRenderer, CSVRenderer
+from .writer import write
+
+
+def parse_date_range(query_params):
+    """Read the optional ?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD query parameters."""
+    dates = []
+    for param in ('start_date', 'end_date'):
+        value = query_params.get(param)
+        try:
+            dates.append(parse_date(value) if value else None)
+        except ValueError:
+            dates.append(None)
+        if value and dates[-1] is None:
+            raise ParseError(f"Invalid {param} '{value}', expected YYYY-MM-DD")
+    return tuple(dates)
+
+def date_range_lookups(field, start_date=None, end_date=None, as_datetime=True):
+    """Filter kwargs restricting the datetime (or date) `field` to the given (inclusive) dates."""
+    lookups = {}
+    if not as_datetime:
+        if start_date:
+            lookups[f'{field}__gte'] = start_date
+        if end_date:
+            lookups[f'{field}__lte'] = end_date
+        return lookups
+    if start_date:
+        lookups[f'{field}__gte'] = timezone.make_aware(datetime.combine(start_date, time.min))
+    if end_date:
+        lookups[f'{field}__lt'] = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return lookups
 
 
 class StockXUserCreateAPIView(generics.CreateAPIView):
@@ -58,7 +103,7 @@ class StoreUserVerificationView(APIView):
         except StoreUser.DoesNotExist:
             return Response({"error": "Store user not found."}, status=status.HTTP_404_NOT_FOUND)
  
-class UserStoreAPIView(generics.ListAPIView):
+class UserStoreAPIView(ConditionalListMixin, generics.ListAPIView):
     serializer_class = StoreSerializer
 
     def get_queryset(self):
@@ -82,19 +127,19 @@ class StoreCreateAPIView(generics.CreateAPIView):
         store.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class BrandListAPIView(generics.ListAPIView):
+class BrandListAPIView(ConditionalListMixin, generics.ListAPIView):
     queryset = Brand.objects.all()
     serializer_class = BrandSerializer
 
-class CategoryListAPIView(generics.ListAPIView):
+class CategoryListAPIView(ConditionalListMixin, generics.ListAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     
-class SizeRangeListAPIView(generics.ListAPIView):
+class SizeRangeListAPIView(ConditionalListMixin, generics.ListAPIView):
     queryset = SizeRange.objects.all()
     serializer_class = SizeRangeSerializer
     
-class ColorListAPIView(generics.ListAPIView):
+class ColorListAPIView(ConditionalListMixin, generics.ListAPIView):
     queryset = Color.objects.all()
     serializer_class = ColorSerializer
 
@@ -107,55 +152,53 @@ class ProductCreateAPIView(generics.CreateAPIView):
         validated_data = serializer.validated_data
         initial_quantity = validated_data.get('initial_quantity', 0)
         low_stock_threshold = validated_data.get('low_stock_threshold', 1)
-        product = serializer.save()
         default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
         user = request.data.get('user', default_user)
         # Filter products based on the Telegram user ID provided in the request
-        store = Store.objects.filter(owner__tg_id=user['tg_id']).first()
+        store = request.store
         if not store:
             return Response({'error': 'Store not found for the provided user ID'}, status=status.HTTP_404_NOT_FOUND)
 
-        if initial_quantity > 0:
-            Stock.objects.create(store=store, product=product, stock_on_hand=initial_quantity, low_stock_threshold=low_stock_threshold, created_by=user['first_name'])
-            StockTransaction.objects.create(store=store, product=product, quantity=initial_quantity, stock_type='1', modified_by=user['first_name'])
+        def create_product():
+            product = serializer.save()
+            if initial_quantity > 0:
+                Stock.objects.create(store=store, product=product, stock_on_hand=initial_quantity, low_stock_threshold=low_stock_threshold, created_by=user['first_name'])
+                StockTransaction.objects.create(store=store, product=product, quantity=initial_quantity, stock_type='1', modified_by=user['first_name'])
+                DailyProductRollup.record(store, product, units_in=initial_quantity)
+
+        write(create_product)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class ProductListAPIView(generics.ListAPIView):
+class ProductListAPIView(ConditionalListMixin, DeltaSyncMixin, SparseFieldsMixin, ValuesListMixin, generics.ListAPIView):
     serializer_class = ProductListSerializer
+    validator_models = (Category, Brand, Color)
 
     def get_queryset(self):
-        default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
-        user = self.request.data.get('user', default_user)
-        # Filter products based on the Telegram user ID provided in the request
-        return Product.objects.filter(store__owner__tg_id=user['tg_id'])
+        # Filter products on the store resolved for the Telegram user by the authentication
+        return Product.objects.for_store(self.request.store).select_related('category', 'brand').prefetch_related('colors')
 
-class ProductDetailAPIView(generics.RetrieveAPIView):
+class ProductDetailAPIView(SparseFieldsMixin, generics.RetrieveAPIView):
     serializer_class = ProductDetailSerializer
 
     def get_queryset(self):
-        default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
-        user = self.request.data.get('user', default_user)
-        # Filter products based on the Telegram user ID provided in the request
-        return Product.objects.filter(store__owner__tg_id=user['tg_id'])
-class ProductByCategoryListAPIView(generics.ListAPIView):
+        # Filter products on the store resolved for the Telegram user by the authentication
+        return Product.objects.for_store(self.request.store).select_related('category', 'brand', 'size_range').prefetch_related('colors')
+class ProductByCategoryListAPIView(ConditionalListMixin, DeltaSyncMixin, SparseFieldsMixin, ValuesListMixin, generics.ListAPIView):
     serializer_class = ProductListSerializer
+    validator_models = (Category, Brand, Color)
 
     def get_queryset(self):
-        default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
-        user = self.request.data.get('user', default_user)
         # Filter products by category based on the category ID provided in the URL
         category_id = self.kwargs['category']
-        return Product.objects.filter(category_id=category_id, store__owner__tg_id=user['tg_id'])
+        return Product.objects.for_store(self.request.store).filter(category_id=category_id).select_related('category', 'brand').prefetch_related('colors')
 
-class ProductByBrandListAPIView(generics.ListAPIView):
+class ProductByBrandListAPIView(ConditionalListMixin, DeltaSyncMixin, SparseFieldsMixin, ValuesListMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
 
     def get_queryset(self):
-        default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
-        user = self.request.data.get('user', default_user)
         # Filter products by brand based on the brand ID provided in the URL
         brand_id = self.kwargs['brand']
-        return Product.objects.filter(brand_id=brand_id, store__owner__tg_id=user['tg_id'])
+        return Product.objects.for_store(self.request.store).filter(brand_id=brand_id).prefetch_related('colors')
 class StockCreateAPIView(generics.CreateAPIView):
     serializer_class = StockSerializer
 
@@ -168,35 +211,39 @@ class StockCreateAPIView(generics.CreateAPIView):
         
         default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
         user = request.data.get('user', default_user)
-        user_store = Store.objects.filter(owner__tg_id=user['tg_id']).first()
+        user_store = request.store
         
         if not user_store:
             return Response({'error': 'Store not found for the provided user ID'}, status=status.HTTP_404_NOT_FOUND)
-        if not Product.objects.filter(store=user_store, id=product.id).exists():
+        if not Product.objects.for_store(user_store).filter(id=product.id).exists():
             return Response({'error': 'Product not found in the user store'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Try to retrieve existing stock instance
-        try:
-            stock = Stock.objects.get(product=product)
-            stock.update_stock_on_hand(quantity)
-        except Stock.DoesNotExist:
-            # Create new stock instance if it doesn't exist
-            stock = Stock.objects.create(
+        def add_stock():
+            # Try to retrieve existing stock instance, locking its row (on PostgreSQL) until
+            # the increment commits so concurrent restocks don't overwrite each other
+            try:
+                stock = Stock.objects.select_for_update().get(product=product)
+                stock.update_stock_on_hand(quantity)
+            except Stock.DoesNotExist:
+                # Create new stock instance if it doesn't exist
+                stock = Stock.objects.create(
+                    product=product,
+                    stock_on_hand=quantity,
+                    created_by=user['tg_id'],
+                    store=user_store
+                )
+
+            # Create stock transaction
+            StockTransaction.objects.create(
                 product=product,
-                stock_on_hand=quantity,
-                created_by=user['tg_id'],
+                quantity=quantity,
+                stock_type='1',
+                modified_by=user['tg_id'],
                 store=user_store
             )
+            DailyProductRollup.record(user_store, product, units_in=quantity)
 
-        # Create stock transaction
-        StockTransaction.objects.create(
-            product=product,
-            quantity=quantity,
-            stock_type='1',
-            modified_by=user['tg_id'],
-            store=user_store
-        )
-
+        write(add_stock)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 class StockUpdateAPIView(generics.UpdateAPIView):
@@ -207,63 +254,80 @@ class StockUpdateAPIView(generics.UpdateAPIView):
         product_id = request.data.get('product')
         default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
         user = request.data.get('user', default_user)
-        user_store = Store.objects.filter(owner__tg_id=user['tg_id']).first()
+        user_store = request.store
         if not user_store:
             return Response({'error': 'Store not found for the provided user ID'}, status=status.HTTP_404_NOT_FOUND)
         
         # Retrieve the stock object using the product identifier
         try:
-            stock = Stock.objects.get(product_id=product_id, store=user_store)
+            stock = Stock.objects.for_store(user_store).get(product_id=product_id)
         except Stock.DoesNotExist:
             return Response({'error': 'Stock not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Update the stock object with the request data
         # the stock_on_hand field is the only field that can be updated and it should be increamented not replaced
         
-        stock.stock_on_hand += int(request.data.get('stock_on_hand'))
-        stock.save()
-        serializer = self.get_serializer(stock)
-        
-        
-        # Create stock transaction
-        quantity = request.data.get('stock_on_hand')
+        quantity = int(request.data.get('stock_on_hand'))
         modified_by = request.data.get('created_by')
-        stock_transaction = StockTransaction.objects.create(
-            store=user_store,
-            product_id=product_id,
-            quantity=quantity,
-            stock_type='1',
-            modified_by=modified_by
-        )
+
+        def restock():
+            # Increment in the database, the row may have changed since it was read above
+            Stock.objects.filter(pk=stock.pk).update(stock_on_hand=F('stock_on_hand') + quantity, updated_at=timezone.now())
+            stock.refresh_from_db()
+
+            # Create stock transaction
+            stock_transaction = StockTransaction.objects.create(
+                store=user_store,
+                product_id=product_id,
+                quantity=quantity,
+                stock_type='1',
+                modified_by=modified_by
+            )
+            DailyProductRollup.record(user_store, stock.product_id, units_in=quantity)
+
+        write(restock)
+        serializer = self.get_serializer(stock)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
-class StockTransactionListAPIView(generics.ListAPIView):
+# Side-loaded by ?format=normalized transaction lists: their products and what those reference
+TRANSACTION_INCLUDED = (
+    ('products', 'product', None, ProductSerializer),
+    ('categories', 'category', 'products', CategorySerializer),
+    ('brands', 'brand', 'products', BrandSerializer),
+    ('colors', 'colors', 'products', ColorSerializer),
+)
+
+class StockTransactionListAPIView(ReplicaReadMixin, ConditionalListMixin, NormalizedListMixin, SparseFieldsMixin, ValuesListMixin, generics.ListAPIView):
     serializer_class = StockTransactionListSerializer
+    normalized_serializer_class = StockTransactionSerializer
+    included = TRANSACTION_INCLUDED
+    pagination_class = KeysetPagination
+    validator_fields = ('created_at', 'product__updated_at')
+    validator_models = (Category, Brand, Color)
 
     def get_queryset(self):
-        default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
-        user = self.request.data.get('user', default_user)
-        # Filter stock transactions based on the Telegram user ID provided in the request
-        return StockTransaction.objects.filter(product__store__owner__tg_id=user['tg_id'])
+        start_date, end_date = parse_date_range(self.request.query_params)
+        # Filter stock transactions on the store resolved for the Telegram user
+        return StockTransaction.objects.for_store(self.request.store).filter(**date_range_lookups('created_at', start_date, end_date)).select_related('product__category', 'product__brand').prefetch_related('product__colors')
 
-class StockListAPIView(generics.ListAPIView):
+class StockListAPIView(ConditionalListMixin, DeltaSyncMixin, SparseFieldsMixin, ValuesListMixin, generics.ListAPIView):
     serializer_class = StockDetailSerializer
+    validator_fields = ('updated_at', 'product__updated_at')
+    delta_fields = ('updated_at', 'product__updated_at')
+    tombstone_field = 'product__is_active'
+    validator_models = (Category, Brand, Color)
 
     def get_queryset(self):
-        default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
-        user = self.request.data.get('user', default_user)
-        # Filter stock based on the Telegram user ID provided in the request
-        return Stock.objects.filter(product__store__owner__tg_id=user['tg_id'])
+        # Filter stock on the store resolved for the Telegram user
+        return Stock.objects.for_store(self.request.store).select_related('product__category', 'product__brand').prefetch_related('product__colors')
 
-class StockDetailAPIView(generics.RetrieveAPIView):
+class StockDetailAPIView(SparseFieldsMixin, generics.RetrieveAPIView):
     serializer_class = StockDetailSerializer
 
     def get_queryset(self):
-        default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
-        user = self.request.data.get('user', default_user)
-        # Filter stock based on the Telegram user ID provided in the request
-        return Stock.objects.filter(product__store__owner__tg_id=user['tg_id'])
+        # Filter stock on the store resolved for the Telegram user
+        return Stock.objects.for_store(self.request.store).select_related('product__category', 'product__brand').prefetch_related('product__colors')
     
 class SalesTransactionCreateAPIView(generics.CreateAPIView):
     serializer_class = SalesTransactionSerializer
@@ -278,13 +342,15 @@ class SalesTransactionCreateAPIView(generics.CreateAPIView):
         default_user = {'tg_id': '441609134', 'first_name': 'tester', 'last_name': 'admin'}
         user = self.request.data.get('user', default_user)
         # Filter sales transactions based on the Telegram user ID provided in the request
-        user_store = Store.objects.filter(owner__tg_id=user['tg_id']).first()
+        user_store = request.store
         if not user_store:
             return Response({'error': 'Store not found for the provided user ID'}, status=status.HTTP_404_NOT_FOUND)
         store = user_store
 
-        try:
-            self.handle_errors(product, quantity_sold)
+        # Stock decrement, stock transaction, sale and rollup succeed or fail together
+        def record_sale():
+            if not Stock.decrement_stock_on_hand(store, product, quantity_sold):
+                self.handle_errors(product, quantity_sold, store)
             
             # Create stock transaction
             StockTransaction.objects.create(
@@ -294,79 +360,240 @@ class SalesTransactionCreateAPIView(generics.CreateAPIView):
                 stock_type='2',
                 modified_by=user['tg_id']
             )
-            
-            # Update stock on hand
-            stock = Stock.objects.get(product=product, store=store)
-            stock.stock_on_hand -= quantity_sold
-            stock.save()
-            serializer.save()
-            
+            sale = serializer.save()
+            DailyProductRollup.record(
+                store, product,
+                units_out=quantity_sold,
+                units_sold=quantity_sold,
+                revenue=sale.total_amount,
+                cost=quantity_sold * product.cost_price
+            )
+
+        try:
+            write(record_sale)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         
         except ValidationError as error:
-            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+            # Selling more than is left conflicts with the current stock, the rest is a bad request
+            error_status = status.HTTP_409_CONFLICT if error.code == 'out_of_stock' else status.HTTP_400_BAD_REQUEST
+            return Response({'error': str(error)}, status=error_status)
 
-    def handle_errors(self, product, quantity_sold):
-        try:
-            stock = Stock.objects.get(product=product)
-        except Stock.DoesNotExist:
+    def handle_errors(self, product, quantity_sold, store):
+        # Only reached when the conditional decrement matched no row, to report why
+        if not Stock.objects.for_store(store).filter(product=product).exists():
             raise ValidationError(f"Stock for product [{product}] does not exist")
         
-        if stock.stock_on_hand < quantity_sold:
-            raise ValidationError(f"Not enough stock for product [{product}]")
+        raise ValidationError(f"Not enough stock for product [{product}]", code='out_of_stock')
+
+class SalesCartCreateAPIView(generics.CreateAPIView):
+    serializer_class = SalesCartSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lines = serializer.validated_data['lines']
+        sold_by = serializer.validated_data['sold_by']
+
+        default_user = {'tg_id': '441609134', 'first_name': 'tester', 'last_name': 'admin'}
+        user = self.request.data.get('user', default_user)
+        store = request.store
+        if not store:
+            return Response({'error': 'Store not found for the provided user ID'}, status=status.HTTP_404_NOT_FOUND)
 
-class SalesTransactionListAPIView(generics.ListAPIView):
+        # Total quantity per product, a product may appear on several lines
+        quantities = defaultdict(int)
+        for line in lines:
+            quantities[line['product']] += line['quantity_sold']
+
+        # Validate every line against the store's stock with one query
+        stocks = {stock.product_id: stock for stock in Stock.objects.for_store(store).filter(product_id__in=quantities).select_related('product')}
+        results = []
+        missing = oversold = False
+        for line in lines:
+            stock = stocks.get(line['product'])
+            if stock is None:
+                error = f"Stock for product [{line['product']}] does not exist"
+                missing = True
+            elif stock.stock_on_hand < quantities[line['product']]:
+                error = f"Not enough stock for product [{stock.product}]"
+                oversold = True
+            else:
+                error = None
+            results.append({'product': line['product'], 'quantity_sold': line['quantity_sold'], 'recorded': False, 'error': error})
+        if missing or oversold:
+            # Like a single sale: too little stock is a conflict, an unknown product a bad request
+            error_status = status.HTTP_400_BAD_REQUEST if missing else status.HTTP_409_CONFLICT
+            return Response({'lines': results}, status=error_status)
+
+        # All lines are recorded or none is
+        def record_cart():
+            if not Stock.decrement_stocks_on_hand(store, quantities):
+                raise ValidationError("Stock changed while recording the sale, please try again")
+
+            stock_transactions = []
+            sales = []
+            for line in lines:
+                product = stocks[line['product']].product
+                unit_price = line.get('unit_price', product.selling_price)
+                stock_transactions.append(StockTransaction(
+                    store=store,
+                    product=product,
+                    quantity=-line['quantity_sold'],
+                    stock_type='2',
+                    modified_by=user['tg_id']
+                ))
+                # bulk_create skips SalesTransaction.save(), so price the line here
+                sales.append(SalesTransaction(
+                    store=store,
+                    product=product,
+                    quantity_sold=line['quantity_sold'],
+                    unit_price=unit_price,
+                    total_amount=line['quantity_sold'] * unit_price,
+                    sold_by=sold_by
+                ))
+            StockTransaction.objects.bulk_create(stock_transactions)
+            SalesTransaction.objects.bulk_create(sales)
+
+            # One rollup update per product, not per line
+            for product_id, quantity in quantities.items():
+                product = stocks[product_id].product
+                DailyProductRollup.record(
+                    store, product,
+                    units_out=quantity,
+                    units_sold=quantity,
+                    revenue=sum(sale.total_amount for sale in sales if sale.product_id == product_id),
+                    cost=quantity * product.cost_price
+                )
+            return sales
+
+        try:
+            sales = write(record_cart)
+        except ValidationError as error:
+            return Response({'error': str(error)}, status=status.HTTP_409_CONFLICT)
+
+        for result, sale in zip(results, SalesTransactionSerializer(sales, many=True).data):
+            result['recorded'] = True
+            result['sale'] = sale
+        return Response({'lines': results}, status=status.HTTP_201_CREATED)
+
+class SalesTransactionListAPIView(ReplicaReadMixin, ConditionalListMixin, NormalizedListMixin, SparseFieldsMixin, ValuesListMixin, generics.ListAPIView):
     serializer_class = SalesTransactionListSerializer
+    normalized_serializer_class = SalesTransactionSerializer
+    included = TRANSACTION_INCLUDED
+    pagination_class = KeysetPagination
+    validator_fields = ('created_at', 'product__updated_at')
+    validator_models = (Category, Brand, Color)
 
     def get_queryset(self):
-        default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
-        user = self.request.data.get('user', default_user)
-        # Filter sales transactions based on the Telegram user ID provided in the request
-        return SalesTransaction.objects.filter(product__store__owner__tg_id=user['tg_id'])
+        start_date, end_date = parse_date_range(self.request.query_params)
+        # Filter sales transactions on the store resolved for the Telegram user
+        return SalesTransaction.objects.for_store(self.request.store).filter(**date_range_lookups('created_at', start_date, end_date)).select_related('product__category', 'product__brand').prefetch_related('product__colors')
+
+class TransactionExportAPIView(APIView):
+    """
+    Stream a transaction history as NDJSON (default) or CSV (?format=csv).
+    Rows are read with QuerySet.iterator() and written as they arrive, so memory
+    use stays flat however long the history is.
+    """
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    model = None
+    filename = None
+    # (column name, queryset lookup) pairs
+    columns = ()
+    chunk_size = 2000
 
-class ProductPerformanceAPIView(generics.ListAPIView):
+    def get_queryset(self):
+        start_date, end_date = parse_date_range(self.request.query_params)
+        filters = date_range_lookups('created_at', start_date, end_date)
+        # Optional ?store= and ?product= filters
+        for param in ('store', 'product'):
+            value = self.request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    raise ParseError(f"Invalid {param} '{value}', expected an id")
+                filters[f'{param}_id'] = int(value)
+        return self.model.objects.for_store(self.request.store).filter(**filters).order_by('created_at', 'id').values_list(*[lookup for _, lookup in self.columns])
+
+    def get(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        queryset = self.get_queryset()
+        # Rows are read after the request (and its store's shard) is done, so fix the database now
+        rows = queryset.using(queryset.db).iterator(chunk_size=self.chunk_size)
+        response = StreamingHttpResponse(
+            renderer.stream([column for column, _ in self.columns], rows),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.{renderer.format}"'
+        return response
+
+class SalesTransactionExportAPIView(TransactionExportAPIView):
+    model = SalesTransaction
+    filename = 'sales-transactions'
+    columns = (
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('store', 'store_id'),
+        ('product', 'product_id'),
+        ('product_code', 'product__code'),
+        ('quantity_sold', 'quantity_sold'),
+        ('unit_price', 'unit_price'),
+        ('total_amount', 'total_amount'),
+        ('sold_by', 'sold_by'),
+    )
+
+class StockTransactionExportAPIView(TransactionExportAPIView):
+    model = StockTransaction
+    filename = 'stock-transactions'
+    columns = (
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('stock_date', 'stock_date'),
+        ('store', 'store_id'),
+        ('product', 'product_id'),
+        ('product_code', 'product__code'),
+        ('quantity', 'quantity'),
+        ('stock_type', 'stock_type'),
+        ('modified_by', 'modified_by'),
+    )
+
+class ProductPerformanceAPIView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = ProductReportSerializer
 
     def get_queryset(self):
-        default_user = {'tg_id': '441609134', 'first_name': 'admin', 'last_name': 'admin'}
-        user = self.request.data.get('user', default_user)
-        user_store = Store.objects.filter(owner__tg_id=user['tg_id']).first()
+        user_store = self.request.store
+        # Optional ?start_date=&end_date= scoping of the stock and sales transactions
+        start_date, end_date = parse_date_range(self.request.query_params)
         try:
-            # Calculate total stock in and out
-            total_stock_in = StockTransaction.objects.filter(store=user_store, stock_type='1').aggregate(Sum('quantity'))['quantity__sum'] or 0
-            total_stock_out = StockTransaction.objects.filter(store=user_store, stock_type='2').aggregate(Sum('quantity'))['quantity__sum'] or 0
+            # Totals come from the daily rollups rather than the raw transaction tables
+            rollups = DailyProductRollup.objects.for_store(user_store).filter(**date_range_lookups('date', start_date, end_date, as_datetime=False))
+            totals = rollups.aggregate(total_stock_in=Sum('units_in'), total_units_out=Sum('units_out'))
+            total_stock_in = totals['total_stock_in'] or 0
+            total_stock_out = -(totals['total_units_out'] or 0)
             
-            # Calculate total stock amount and value
+            # Calculate total stock amount
             total_stock_on_hand = total_stock_in - (-1*total_stock_out)
-            total_stock_value = total_stock_on_hand * Stock.objects.first().product.cost_price
 
-            # Get best selling product
-            # best_selling_product = SalesTransaction.objects.values('product__code').annotate(total_sold=Sum('quantity_sold')).order_by('-total_sold').first()
+            # Quantity sold per stocked product, grouped in the database
+            sales_filter = Q(product__daily_rollups__store=user_store, **date_range_lookups('product__daily_rollups__date', start_date, end_date, as_datetime=False))
+            product_sales = Stock.objects.for_store(user_store).order_by('id').values(
+                'product__code', 'stock_on_hand', 'product__cost_price'
+            ).annotate(
+                quantity_sold=Coalesce(Sum('product__daily_rollups__units_sold', filter=sales_filter), 0)
+            )
+
+            # Stock value is what is on hand priced at each product's cost price
+            total_stock_value = sum((row['stock_on_hand'] * row['product__cost_price'] for row in product_sales), Decimal('0.00'))
 
-            # Get list of least selling products with their minimum sold quantities
+            # Get list of best and least selling products with their sold quantities
             least_selling = {}
             best_selling = {}
-            product_sales = {}
-            all_products = Stock.objects.filter(store=user_store)
-            all_sales_transactions = SalesTransaction.objects.filter(store=user_store)
-            for product in all_products:
-                product_sales[product.product.code] = 0
-            for product in product_sales:
-                for sale in all_sales_transactions:
-                    if sale.product.code == product:
-                        product_sales[product] += sale.quantity_sold
-            
             if product_sales:
-                sorted_product_sales = dict(sorted(product_sales.items(), key=lambda item: item[1]))
-                min_sales = min(sorted_product_sales.values())
-                max_sales = max(sorted_product_sales.values())
-                
-                least_selling_products = [product for product, sales in sorted_product_sales.items() if sales == min_sales]
-                best_selling_products = [product for product, sales in sorted_product_sales.items() if sales == max_sales]
+                min_sales = min(row['quantity_sold'] for row in product_sales)
+                max_sales = max(row['quantity_sold'] for row in product_sales)
                 
-                least_selling['products'] = least_selling_products
+                least_selling['products'] = [row['product__code'] for row in product_sales if row['quantity_sold'] == min_sales]
                 least_selling['quantity_sold'] = min_sales
-                best_selling['products'] = best_selling_products
+                best_selling['products'] = [row['product__code'] for row in product_sales if row['quantity_sold'] == max_sales]
                 best_selling['quantity_sold'] = max_sales
             else:
                 least_selling['products'] = []
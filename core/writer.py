@@ -0,0 +1,126 @@
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+
+from .models import StockTransaction
+
+
+class GroupCommitWriter:
+    """
+    Dedicated thread performing the queued write operations of every request.
+
+    SQLite admits one writer at a time, so instead of request threads queueing
+    up on the database lock (and paying one commit each), the writer takes
+    whatever operations are waiting, up to `max_batch` or `max_delay` seconds
+    after the first one, and runs them in a single transaction. Each operation
+    runs in its own savepoint, so a failing one is rolled back and re-raised in
+    its request while the rest of the batch commits. Operations for different
+    databases (per-store shards) commit in one transaction per database.
+    """
+
+    def __init__(self, max_batch=64, max_delay=0.002):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, operation, timeout=None, using='default'):
+        """Queue `operation` (a callable) and block until its batch commits; return its result."""
+        self._ensure_started()
+        future = Future()
+        # The operation runs in the caller's context, so it sees the same router state (its store)
+        context = contextvars.copy_context()
+        self._queue.put((using, lambda: context.run(operation), future))
+        return future.result(timeout=timeout)
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        # Each batch is handled like a request: drop a connection past CONN_MAX_AGE or broken
+        # before using it and after (which hands a pooled connection back to the pool)
+        close_old_connections()
+        try:
+            self._commit_batch(batch)
+        finally:
+            close_old_connections()
+
+    def _commit_batch(self, batch):
+        databases = {}
+        for using, operation, future in batch:
+            databases.setdefault(using, []).append((operation, future))
+        for using, operations in databases.items():
+            self._commit_operations(using, operations)
+
+    def _commit_operations(self, using, batch):
+        outcomes = []
+        try:
+            with transaction.atomic(using=using):
+                for operation, future in batch:
+                    try:
+                        with transaction.atomic(using=using):
+                            outcomes.append((future, operation(), None))
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+        except Exception as error:
+            # The commit itself failed, nothing of the batch was written
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = GroupCommitWriter(
+                    max_batch=getattr(settings, 'WRITE_QUEUE_MAX_BATCH', 64),
+                    max_delay=getattr(settings, 'WRITE_QUEUE_MAX_DELAY', 0.002),
+                )
+    return _writer
+
+
+def write(operation):
+    """
+    Run `operation` atomically and return its result, through the group commit
+    writer when settings.WRITE_QUEUE_ENABLED is set. Exceptions raised by the
+    operation propagate to the caller, after rolling back what it wrote.
+    """
+    # The database the request's operational rows are written to (its store's shard when sharded)
+    using = router.db_for_write(StockTransaction)
+    # A caller already in a transaction must see its own uncommitted rows, so run inline
+    if not getattr(settings, 'WRITE_QUEUE_ENABLED', False) or connections[using].in_atomic_block:
+        with transaction.atomic(using=using):
+            return operation()
+    return get_writer().submit(operation, timeout=getattr(settings, 'WRITE_QUEUE_TIMEOUT', 30), using=using)
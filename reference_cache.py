@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceCache:
+    """In-process TTL cache for the catalog reference lists.
+
+    Categories, brands, size ranges and colors change rarely, so they are
+    fetched once, indexed by id and refreshed in the background. Expired entries
+    keep being served while a refresh runs, so handlers never wait on the API
+    after warm-up.
+    """
+
+    RESOURCES = {
+        'categories': '/categories/',
+        'brands': '/brands/',
+        'size_ranges': '/size-ranges/',
+        'colors': '/colors/',
+    }
+
+    def __init__(self, api, ttl=300, refresh_interval=None):
+        self.api = api
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval or ttl / 2
+        # name -> (items, items_by_id, fetched_at)
+        self._entries = {}
+        self._locks = {name: asyncio.Lock() for name in self.RESOURCES}
+        self._pending = {}
+        self._refresh_task = None
+
+    async def all(self, name):
+        """Return the cached list for `name`, fetching it on first use."""
+        return (await self._entry(name))[0]
+
+    async def get(self, name, item_id):
+        """Return the item of `name` with the given id, or None."""
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            return None
+        return (await self._entry(name))[1].get(item_id)
+
+    async def refresh(self, name):
+        """Fetch `name` from the API and replace the cached entry."""
+        async with self._locks[name]:
+            return await self._fetch(name)
+
+    async def warm_up(self):
+        """Load every resource, logging (not raising) failures."""
+        results = await asyncio.gather(*(self.refresh(name) for name in self.RESOURCES), return_exceptions=True)
+        for name, result in zip(self.RESOURCES, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error warming up reference data '{name}': {result}")
+
+    async def start(self):
+        """Warm up the cache and start the periodic background refresh."""
+        await self.warm_up()
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Cancel the background refresh."""
+        tasks = [task for task in [self._refresh_task, *self._pending.values()] if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refresh_task = None
+        self._pending.clear()
+
+    async def _entry(self, name):
+        entry = self._entries.get(name)
+        if entry is None:
+            async with self._locks[name]:
+                # Another handler may have loaded it while we waited
+                entry = self._entries.get(name) or await self._fetch(name)
+            return entry
+        if time.monotonic() - entry[2] > self.ttl:
+            self._schedule_refresh(name)
+        return entry
+
+    async def _fetch(self, name):
+        response = await self.api.get(self.RESOURCES[name])
+        response.raise_for_status()
+        items = response.json()
+        self._entries[name] = (items, {int(item['id']): item for item in items}, time.monotonic())
+        return self._entries[name]
+
+    def _schedule_refresh(self, name):
+        # Serve the stale entry and refresh it once in the background
+        if name in self._pending:
+            return
+        task = asyncio.create_task(self.refresh(name))
+        self._pending[name] = task
+        task.add_done_callback(lambda t: self._refresh_done(name, t))
+
+    def _refresh_done(self, name, task):
+        self._pending.pop(name, None)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Error refreshing reference data '{name}': {task.exception()}")
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.warm_up()
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class RenderQueueFull(Exception):
+    """Raised when too many chart jobs are already waiting to be rendered."""
+
+
+def _init_worker():
+    # Import the plotting stack once per worker instead of once per chart
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+    import numpy  # noqa: F401
+    import charts  # noqa: F401
+
+
+def _ready():
+    return os.getpid()
+
+
+class ChartRenderer:
+    """Render matplotlib charts in a pool of warmed-up worker processes.
+
+    `render` is awaited from the bot handlers, so building a report never blocks
+    the event loop. At most `max_pending` jobs are accepted at once and each job
+    is given `timeout` seconds to finish; a worker can't be interrupted, so a
+    job that times out stays pending until it has actually finished.
+    """
+
+    def __init__(self, workers=None, max_pending=32, timeout=30.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = 0
+        self._executor = None
+
+    @classmethod
+    def from_env(cls):
+        """Build a renderer from the CHART_* environment variables."""
+        workers = os.getenv('CHART_WORKERS')
+        return cls(
+            workers=int(workers) if workers else None,
+            max_pending=int(os.getenv('CHART_MAX_PENDING', 32)),
+            timeout=float(os.getenv('CHART_TIMEOUT', 30)),
+        )
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    async def start(self):
+        """Spawn every worker up front so the first report doesn't pay the import cost."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _ready) for _ in range(self.workers)))
+
+    async def render(self, func, *args, **kwargs):
+        """Run `func(*args, **kwargs)` (a function from `charts`) in the pool and return its result."""
+        if self._pending >= self.max_pending:
+            raise RenderQueueFull(f"{self._pending} chart jobs already pending")
+        loop = asyncio.get_running_loop()
+        job = self.executor.submit(func, *args, **kwargs)
+        # A timed out job keeps its worker busy, so it counts as pending until it really finishes
+        self._pending += 1
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._job_done))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Rendering {func.__name__} timed out after {self.timeout}s")
+            raise
+
+    def _job_done(self):
+        self._pending -= 1
+
+    async def close(self):
+        """Shut the worker pool down."""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.get_running_loop().run_in_executor(None, lambda: executor.shutdown(cancel_futures=True))